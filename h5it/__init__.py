@@ -1,5 +1,9 @@
-from .base import load, dump  # main API for saving and loading files.
+from .base import load, dump, open  # main API for saving and loading files.
+from .base import register
+from .base import Excluded
 from .stdpickle import H5itPicklingError, H5itUnpicklingError
+from .storage import Compression, Chunking
+from .lazy import LazyArray
 
 from ._version import get_versions
 __version__ = get_versions()['version']
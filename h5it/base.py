@@ -1,7 +1,11 @@
 from __future__ import unicode_literals
 
 import os
+import posixpath
+from fnmatch import fnmatchcase
+from pickle import dispatch_table as copyreg_dispatch_table
 from collections import namedtuple
+from types import GeneratorType
 from pathlib import PosixPath, WindowsPath, PurePosixPath, PureWindowsPath
 import numpy as np
 import h5py
@@ -11,7 +15,13 @@ from .stdpickle import (H5itPicklingError, H5itUnpicklingError,
                         r_key_func, r_key_cls, r_key_args,
                         r_key_state, r_key_listitems, r_key_dictitems,
                         pickle_load_global, pickle_save_global, GlobalTuple,
+                        clear_global_caches,
                         pickle_load_build, pickle_save)
+from .storage import (as_compression, default_compression, as_chunking,
+                      default_chunking, dataset_kwargs, memmap,
+                      read_parallel, write_parallel, parallel_min_size)
+from .lazy import LazyArray
+from .index import TreeIndex, IndexedGroup
 
 if is_py2:
     from types import ClassType, FunctionType, BuiltinFunctionType, TypeType
@@ -20,6 +30,7 @@ if is_py2:
     py3_bytesType = tuple()  # will never encounter Py3 bytes str on Py2
     as_unicode_str = unicode
 
+    intTypes = int, long
     numberTypes = int, long, float, complex
     globalTypes = ClassType, FunctionType, BuiltinFunctionType, TypeType
 elif is_py3:
@@ -29,6 +40,7 @@ elif is_py3:
     py3_bytesType = bytes
     as_unicode_str = str
 
+    intTypes = int,
     numberTypes = int, float, complex
     globalTypes = FunctionType
 else:
@@ -37,9 +49,29 @@ else:
 host_is_posix = os.name == 'posix'
 host_is_windows = os.name == 'nt'
 
+
+def as_text(s):
+    # the module and name of a global are bytes on Python 3, and may be
+    # either on Python 2
+    return s.decode('utf-8') if isinstance(s, bytes) else s
+
+
 attr_key_type = 'type'
 attr_key_type_reduction = 'reduction'
-
+# dicts whose keys can all be node names are saved with the values under
+# them. If the keys are byte strings, their type is recorded (as the
+# 'key_type' attribute of the columnar layout).
+type_str_unicode_dict = 'unicode_dict'
+
+# the class or function of a reduction, or a global itself, is saved as its
+# index in a table of the (module, name) of every global in the file
+attr_key_reduction_cls = 'cls'
+attr_key_reduction_func = 'func'
+attr_key_global = 'global'
+globals_path = '/h5it_globals'
+
+# files saved before there was a table of globals have their module and name
+# as attributes instead
 attr_key_reduction_cls_module = 'cls_module'
 attr_key_reduction_cls_name = 'cls_name'
 attr_key_reduction_func_module = 'func_module'
@@ -48,103 +80,514 @@ attr_key_reduction_func_name = 'func_name'
 attr_key_global_module = 'module'
 attr_key_global_name = 'name'
 
+# a subclass of a type h5it saves itself is saved as that type, along with
+# the subclass, as an index in the table of globals
+attr_key_subclass = 'subclass'
+
+global_attr_keys = {
+    attr_key_reduction_cls: (attr_key_reduction_cls_module,
+                             attr_key_reduction_cls_name),
+    attr_key_reduction_func: (attr_key_reduction_func_module,
+                              attr_key_reduction_func_name),
+    attr_key_global: (attr_key_global_module, attr_key_global_name)}
+
 attr_key_number_value = 'number_value'
 attr_key_bool_value = 'bool_value'
 
+# lists and tuples may be stored in a more compact layout than one child per
+# element. When they are, this attribute records which layout was used.
+attr_key_layout = 'layout'
+layout_packed = 'packed'
+layout_stacked = 'stacked'
+# strings (or bytes) saved as a group of their concatenated encodings, 'data',
+# and where each one starts and ends in it, 'offsets'. The type of the items
+# is recorded in another attribute.
+layout_strings = 'strings'
+attr_key_item_type = 'item_type'
+# with dump(..., columnar=True), instances of one class whose states are
+# dicts with the same keys are saved as their class (in the same attributes
+# as a reduction) and one list per key of the values under it. The type of
+# the keys is recorded in another attribute.
+layout_columnar = 'columnar'
+attr_key_key_type = 'key_type'
+# tuples (or namedtuples) of the same scalar types saved as the rows of a
+# compound dataset. The class of namedtuples is recorded in the same
+# attributes as a reduction.
+layout_records = 'records'
+
+# an array that is one of a stack saved by save_list, found again elsewhere
+type_str_stacked_item = 'stacked_item'
+attr_key_stack_path = 'stack_path'
+attr_key_stack_index = 'stack_index'
+
+# the number of items in a list or tuple group
+attr_key_length = 'length'
+
+# with dump(..., inline=True), None, bools and numbers inside a container are
+# saved as attributes of the container's group rather than as groups of their
+# own, named by this prefix and their key
+attr_key_inline_prefix = 'inline:'
+# past this many attributes on a group, adding more gets slow (they all live
+# in the group's object header), so further values get a group as normal
+inline_max_attrs = 64
+
 top_level_group_namespace = 'h5it'
+top_level_path = '/' + top_level_group_namespace
+
+# where dump(..., consolidated=True) puts the metadata for the whole tree
+consolidated_metadata_path = '/h5it_metadata'
+
+# with dump(..., arena=True), small arrays are saved one after another in a
+# flat dataset per dtype under here, and their own node is a group that just
+# says where in it they are
+arena_path = '/h5it_arena'
+layout_arena = 'arena'
+attr_key_arena = 'arena'
+attr_key_arena_offset = 'offset'
+attr_key_arena_shape = 'shape'
+arena_max_size = 16 * 1024
 
 
 # ------------------------------ IMPORTS ------------------------------ #
 
-ListItem = namedtuple('ListItem', ['i', 'item'])
+# Importers of containers are generators, so that loading deep structures
+# doesn't recurse. They yield a Child for each child node they need, are sent
+# back the object imported from it, and finally yield the object they built
+# (see h5_import).
+Child = namedtuple('Child', ['parent', 'name', 'filtering'])
 
+# how a load's include/exclude filters apply to a Child - as to any node, to
+# everything under it but not the child itself, or not at all (nor to
+# anything under it). The last two are for the parts of a container's
+# structure that it can't be made without, such as the keys of a dict.
+filter_all, filter_below, filter_none = 'all', 'below', 'none'
+Child.__new__.__defaults__ = (filter_all,)
 
-def load_list(parent, name, memo, encoding):
-    node = parent[name]
-    unordered = []
-    for i, j in enumerate(node.keys()):
-        unordered.append(ListItem(int(j), h5_import(node, j, memo, encoding)))
-    ordered = sorted(unordered)
-    counts = [x.i for x in ordered]
-    items = [x.item for x in ordered]
-    if counts != list(range(len(counts))):
+# returned by begin_import for a node whose importer has been started
+pending = object()
+
+
+def inline_key(name):
+    return attr_key_inline_prefix + name
+
+
+def load_inline(value):
+    # None is saved as its type string, as it has no value to save
+    return None if isinstance(value, strType) else np.asscalar(value)
+
+
+def node_keys(node):
+    r"""
+    The keys of the children of group ``node``, including any saved inline.
+    """
+    n = len(attr_key_inline_prefix)
+    inlined = [k[n:] for k in node.attrs
+               if k.startswith(attr_key_inline_prefix)]
+    if len(inlined) == 0:
+        return node.keys()
+    return sorted(list(node.keys()) + inlined)
+
+
+def has_child(node, name):
+    return name in node or inline_key(name) in node.attrs
+
+
+def list_keys(node):
+    r"""
+    The keys of the items of list group ``node``, in order.
+    """
+    keys = node_keys(node)
+    n = node.attrs.get(attr_key_length)
+    if n is None:
+        # saved before the length was stored - order by the keys instead
+        keys = sorted(keys, key=int)
+        if [int(k) for k in keys] != list(range(len(keys))):
+            raise H5itUnpicklingError("Attempted to import a list "
+                                      "that is missing elements")
+        return keys
+    # the zero padded keys come back in order, so each item can go straight
+    # in its place - just check that none are missing
+    if len(keys) != n or (n > 0 and keys[-1] != zero_padded(n).format(n - 1)):
         raise H5itUnpicklingError("Attempted to import a list "
                                   "that is missing elements")
-    return items
+    return keys
+
+
+def load_stacked(node, memo):
+    r"""
+    The arrays of a list saved stacked in dataset ``node``.
+    """
+    if memo.lazy:
+        return [LazyArray(node.dataset, i)
+                for i in range(node.dataset.shape[0])]
+    stacked = load_array(node, memo)
+    if memo.copy_views:
+        return [np.array(a) for a in stacked]
+    return list(stacked)
+
+
+def string_decoder(type_str, encoding):
+    r"""
+    The function that makes an item of type ``type_str`` from its bytes, as
+    saved by :func:`save_strings`.
+    """
+    if type_str == 'str':
+        return lambda b: b.decode('utf-8')
+    if type_str == 'py2_bytes' and is_py3:
+        # as load_py2_bytes_on_py3
+        if encoding == 'ASCII':
+            return lambda b: b.decode('ASCII')
+        elif encoding != 'bytes':
+            raise H5itUnpicklingError("The only valid encodings are 'ASCII' "
+                                      "or 'bytes'")
+    return lambda b: b
+
+
+def load_strings(node, encoding):
+    r"""
+    The strings (or bytes) of a list saved packed in group ``node``.
+    """
+    decode = string_decoder(node.attrs[attr_key_item_type], encoding)
+    data = node['data'].value.tobytes()
+    offsets = node['offsets'].value.tolist()
+    return [decode(data[start:end])
+            for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+def load_string_item(node, i, encoding):
+    r"""
+    Item ``i`` of the strings saved packed in group ``node``, reading only
+    that item's bytes.
+    """
+    decode = string_decoder(node.attrs[attr_key_item_type], encoding)
+    start, end = (int(o) for o in node['offsets'][i:i + 2])
+    data = node['data'][start:end].tobytes() if end > start else b''
+    return decode(data)
+
+
+def find_global(node, key, memo):
+    r"""
+    The global (e.g. class or function) that attribute ``key`` of ``node``
+    gives the index of in the file's table of globals. Each is only looked up
+    once per load. Files saved before there was a table have the global's
+    module and name as attributes instead.
+    """
+    if key not in node.attrs:
+        module_key, name_key = global_attr_keys[key]
+        return pickle_load_global(node.attrs[module_key],
+                                  node.attrs[name_key])
+    i = int(node.attrs[key])
+    g = memo.globals.get(i)
+    if g is None:
+        if memo.global_table is None:
+            memo.global_table = node.file[globals_path][()]
+        module, name = (as_text(x).encode('utf-8')
+                        for x in memo.global_table[i])
+        g = memo.globals[i] = pickle_load_global(module, name)
+    return g
+
+
+def load_records(node, rows, memo):
+    r"""
+    The tuples (or namedtuples) saved as the compound array ``rows`` of
+    dataset ``node``, all made at once.
+    """
+    rows = rows.tolist()
+    if attr_key_reduction_cls not in node.attrs:
+        return rows
+    cls = find_global(node, attr_key_reduction_cls, memo)
+    new = cls.__new__
+    return [new(cls, *row) for row in rows]
+
+
+def load_columnar(node, memo, encoding):
+    r"""
+    Import the instances of a list saved by column in group ``node``. Each
+    column is loaded whole, and then the instances are all made at once.
+    """
+    cls = find_global(node, attr_key_reduction_cls, memo)
+    as_key = string_decoder(node.attrs[attr_key_key_type], encoding)
+    n = int(node.attrs[attr_key_length])
+    keys, columns = [], []
+    for k in node.keys():
+        keys.append(as_key(k.encode('utf-8')))
+        column = yield Child(node, k)
+        # a column left out of the load is left out of every instance
+        columns.append([column] * n if isinstance(column, Excluded)
+                       else column)
+    items = [cls.__new__(cls) for _ in range(n)]
+    for obj, values in zip(items, zip(*columns)):
+        pickle_load_build(obj, dict(zip(keys, values)))
+    yield items
+
+
+def new_container(node, base, memo):
+    r"""
+    An empty ``base`` (`list` or `dict`) to load the items of ``node`` into,
+    or an empty instance of the subclass of it that ``node`` was saved from.
+    As pickle does, the subclass is made without calling its ``__init__``.
+    """
+    if attr_key_subclass not in node.attrs:
+        return base()
+    cls = find_global(node, attr_key_subclass, memo)
+    return cls.__new__(cls)
+
+
+def as_subclass(node, obj, memo):
+    r"""
+    ``obj``, as loaded by the importer of the type a subclass instance was
+    saved as, made into an instance of that subclass (as pickle would make
+    it). Arrays become views, which numpy's own subclasses support.
+    """
+    cls = find_global(node, attr_key_subclass, memo)
+    if type(obj) is cls or isinstance(obj, (LazyArray, Excluded)):
+        # already made as the subclass, or not loaded
+        return obj
+    if isinstance(obj, np.ndarray):
+        return obj.view(cls)
+    if isinstance(obj, list):
+        new_obj = cls.__new__(cls)
+        new_obj.extend(obj)
+        return new_obj
+    return cls.__new__(cls, obj)
+
+
+def subclassed(importer, node, memo):
+    r"""
+    Drive the generator ``importer``, making what it imports into an
+    instance of the subclass ``node`` was saved from.
+    """
+    step = next(importer)
+    while isinstance(step, Child):
+        step = importer.send((yield step))
+    yield as_subclass(node, step, memo)
+
+
+def load_laid_out(node, memo, encoding):
+    r"""
+    Import the items of a list (or tuple) saved in one of the layouts that
+    store them all together in group or dataset ``node``, as a list. Yields
+    ``None`` if ``node`` is a plain group with a node per item.
+    """
+    layout = node.attrs.get(attr_key_layout)
+    if layout == layout_packed:
+        # homogeneous scalars - one read gets the lot
+        yield node.value.tolist()
+    elif layout == layout_stacked:
+        # same shape arrays - so does this
+        yield load_stacked(node, memo)
+    elif layout == layout_records:
+        # as do tuples of scalars
+        yield load_records(node, node.value, memo)
+    elif layout == layout_strings:
+        # and strings - two reads
+        yield load_strings(node, encoding)
+    elif layout == layout_columnar:
+        importer = load_columnar(node, memo, encoding)
+        step = next(importer)
+        while isinstance(step, Child):
+            step = importer.send((yield step))
+        yield step
+    else:
+        yield None
+
+
+def load_list(parent, name, memo, encoding):
+    node = parent[name]
+    importer = load_laid_out(node, memo, encoding)
+    step = next(importer)
+    while isinstance(step, Child):
+        step = importer.send((yield step))
+    if step is not None:
+        yield step
+        return
+    items = new_container(node, list, memo)
+    # memoize the list before loading the items, so they can refer back to it
+    memo[node.path] = items
+    for k in list_keys(node):
+        items.append((yield Child(node, k)))
+    yield items
 
 
 def load_tuple(parent, name, memo, encoding):
-    return tuple(load_list(parent, name, memo, encoding))
+    node = parent[name]
+    importer = load_laid_out(node, memo, encoding)
+    step = next(importer)
+    while isinstance(step, Child):
+        step = importer.send((yield step))
+    if step is not None:
+        yield tuple(step)
+        return
+    items = []
+    for k in list_keys(node):
+        items.append((yield Child(node, k)))
+    # if the tuple contains itself (through a list or dict), it was made
+    # again from its items while they were loaded. As pickle does, that one
+    # is used, so that there is only the one tuple.
+    yield memo.get(node.path, tuple(items))
 
 
 def load_unicode_dict(parent, name, memo, encoding):
     node = parent[name]
-    imported_dict = {}
-    for k in node.keys():
-        imported_dict[k] = h5_import(node, k, memo, encoding)
-    return imported_dict
+    imported_dict = new_container(node, dict, memo)
+    memo[node.path] = imported_dict
+    # byte string keys were saved under their text (see node_names)
+    as_key = string_decoder(node.attrs.get(attr_key_key_type, 'str'),
+                            encoding)
+    for k in node_keys(node):
+        imported_dict[as_key(k.encode('utf-8'))] = yield Child(node, k)
+    yield imported_dict
 
 
 def load_dict(parent, name, memo, encoding):
     node = parent[name]
-    return dict(h5_import(node, k, memo, encoding) for k in node.keys())
+    imported_dict = new_container(node, dict, memo)
+    memo[node.path] = imported_dict
+    for k in node.keys():
+        item = node[k]
+        if (isinstance(item, IndexedGroup) and
+                attr_key_layout not in item.attrs):
+            # only the value is filtered (by its path) - a dict can't be
+            # made without its keys
+            key = yield Child(item, '0', filter_none)
+            imported_dict[key] = yield Child(item, '1')
+        else:
+            # a key and value saved packed together, which are cheap to read
+            key, value = yield Child(node, k, filter_none)
+            imported_dict[key] = value
+    yield imported_dict
 
 
 def load_reducible(parent, name, memo, encoding):
     node = parent[name]
     # import the class and new it up
-    if attr_key_global_name in node.attrs:
+    if attr_key_global in node.attrs or attr_key_global_name in node.attrs:
         # reduction actually saved out a global
         # node that it is safe to skip h5_import and hence the memo checking
         # here as we are calling load_global on the exact same node that
         # load_reducible was called on. Prior to invocation a check was made of
         # node to ensure it wasn't a symlink so we are OK.
-        return load_global(parent, name, memo, encoding)
+        yield load_global(parent, name, memo, encoding)
+        return
 
-    # if not, we are loading with NEWOBJ or REDUCE
-    args = load_tuple(node, r_key_args, memo, encoding)
-    if attr_key_reduction_cls_module in node.attrs:
+    # if not, we are loading with NEWOBJ or REDUCE. The args are saved
+    # without a type, so have to be loaded with load_tuple directly. The
+    # object can't be made without them, so none of them is filtered out.
+    args_importer = load_tuple(node, r_key_args, memo, encoding)
+    step = next(args_importer)
+    while isinstance(step, Child):
+        step = args_importer.send((yield step._replace(filtering=filter_none)))
+    args = step
+    if (attr_key_reduction_cls in node.attrs or
+            attr_key_reduction_cls_module in node.attrs):
         # reduction using the NEWOBJ protocol
-        cls_module = node.attrs[attr_key_reduction_cls_module]
-        cls_name = node.attrs[attr_key_reduction_cls_name]
-        cls = pickle_load_global(cls_module, cls_name)
+        cls = find_global(node, attr_key_reduction_cls, memo)
         obj = cls.__new__(cls, *args)
-    elif attr_key_reduction_func_module in node.attrs:
+    elif (attr_key_reduction_func in node.attrs or
+            attr_key_reduction_func_module in node.attrs):
         # reduction using the REDUCE protocol
-        func_module = node.attrs[attr_key_reduction_func_module]
-        func_name = node.attrs[attr_key_reduction_func_name]
-        func = pickle_load_global(func_module, func_name)
+        func = find_global(node, attr_key_reduction_func, memo)
         obj = func(*args)
     else:
         raise H5itUnpicklingError(
             "error loading reduction - can't find {} or {} in attrs".format(
-            attr_key_reduction_cls_module, attr_key_reduction_func_module))
-
-    if r_key_state in node:
-        state = h5_import(node, r_key_state, memo, encoding)
+            attr_key_reduction_cls, attr_key_reduction_func))
+    # as pickle does, memoize the object before its state is loaded
+    memo[node.path] = obj
+
+    if has_child(node, r_key_state):
+        # attributes can be filtered out, like the values of any dict, but
+        # other states (e.g. with slots) are only usable whole
+        state_type = (node[r_key_state].attrs.get(attr_key_type)
+                      if r_key_state in node else None)
+        state = yield Child(node, r_key_state,
+                            filter_below if state_type in dict_type_strs
+                            else filter_none)
         pickle_load_build(obj, state)
 
-    if r_key_listitems in node:
-        listitems = h5_import(node, r_key_listitems, memo, encoding)
+    # the items are added as they are, so are loaded whole too
+    if has_child(node, r_key_listitems):
+        listitems = yield Child(node, r_key_listitems, filter_none)
         for i in listitems:
             obj.append(i)
 
-    if r_key_dictitems in node:
-        iteritems = h5_import(node, r_key_dictitems, memo, encoding)
+    if has_child(node, r_key_dictitems):
+        iteritems = yield Child(node, r_key_dictitems, filter_none)
         for k, v in iteritems:
             obj[k] = v
 
-    return obj
+    yield obj
 
 
 def load_global(parent, name, memo, encoding):
-    module = parent[name].attrs[attr_key_global_module]
-    m_name = parent[name].attrs[attr_key_global_name]
-    return pickle_load_global(module, m_name)
+    return find_global(parent[name], attr_key_global, memo)
+
+
+def load_array(node, memo):
+    r"""
+    The array in dataset ``node``, read as the load settings say.
+    """
+    if memo.mmap:
+        a = memmap(node.dataset)
+        if a is not None:
+            return a
+    if memo.lazy:
+        return LazyArray(node.dataset)
+    if memo.threads > 1:
+        a = read_parallel(node.dataset, memo.threads)
+        if a is not None:
+            return a
+    return node.value
+
+
+def load_arena(index, dtype_str, memo):
+    r"""
+    The whole arena of arrays of dtype ``dtype_str``, read the first time it
+    is needed. For a lazy load it is left in the file, and the dataset
+    holding it is returned instead.
+    """
+    arena = memo.arenas.get(dtype_str)
+    if arena is None:
+        dataset = index[posixpath.join(arena_path, dtype_str)].dataset
+        if memo.mmap:
+            arena = memmap(dataset)
+        if arena is None:
+            arena = dataset if memo.lazy else dataset[()]
+        memo.arenas[dtype_str] = arena
+    return arena
 
 
 def load_ndarray(parent, name, memo, encoding):
-    return parent[name].value
+    node = parent[name]
+    if node.attrs.get(attr_key_layout) == layout_arena:
+        arena = load_arena(node.index, node.attrs[attr_key_arena], memo)
+        shape = tuple(int(i) for i in node.attrs[attr_key_arena_shape])
+        start = int(node.attrs[attr_key_arena_offset])
+        span = slice(start, start + int(np.prod(shape)))
+        if isinstance(arena, h5py.Dataset):
+            return LazyArray(arena, span, shape)
+        a = arena[span].reshape(shape)
+        return np.array(a) if memo.copy_views else a
+    return load_array(node, memo)
+
+
+def load_stacked_item(parent, name, memo, encoding):
+    node = parent[name]
+    stack_path = node.attrs[attr_key_stack_path]
+    stack_parent, stack_name = posixpath.split(stack_path)
+    if memo.filtering and stack_path not in memo:
+        # the item was found where it isn't filtered out, so the stack (or
+        # list of instances) it is part of is loaded as a whole, whatever
+        # the filters say about where that lives
+        filtering, memo.filtering = memo.filtering, False
+        try:
+            stacked = h5_import(node.index[stack_parent], stack_name, memo,
+                                encoding)
+        finally:
+            memo.filtering = filtering
+    else:
+        stacked = yield Child(node.index[stack_parent], stack_name)
+    yield stacked[int(node.attrs[attr_key_stack_index])]
 
 
 def load_none(parent, name, memo, encoding):
@@ -203,51 +646,310 @@ def load_windows_path(parent, name, memo, encoding):
 zero_padded = lambda x: "{:0" + as_unicode_str(len(as_unicode_str(x))) + "}"
 
 
+# scalar types that can be packed into a single typed dataset when a list is
+# made up entirely of one of them
+packed_dtypes = {bool: np.bool_, float: np.float64, complex: np.complex128}
+packed_dtypes.update((t, np.int64) for t in intTypes)
+
+
+def packed_dtype(l):
+    r"""
+    The dtype ``l`` can be packed into, or ``None`` if ``l`` is empty or is not
+    made up of exactly one packable scalar type.
+    """
+    if len(l) == 0:
+        return None
+    type_0 = type(l[0])
+    dtype = packed_dtypes.get(type_0)
+    if dtype is None or not all(type(x) is type_0 for x in l):
+        return None
+    return dtype
+
+
+def strings_type_str(l):
+    r"""
+    The type str of the strings (or bytes) ``l`` is made up of, or ``None`` if
+    ``l`` is empty or is not made up of exactly one string type.
+    """
+    if len(l) == 0:
+        return None
+    type_0 = type(l[0])
+    type_str = type_to_str.get(type_0)
+    if (type_str not in string_type_strs or
+            not all(type(x) is type_0 for x in l)):
+        return None
+    return type_str
+
+
+def save_strings(l, type_str, parent, name, memo):
+    encoded = [x.encode('utf-8') for x in l] if type_str == 'str' else l
+    offsets = np.zeros(len(l) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    data = b''.join(encoded)
+    node = parent.create_group(name)
+    node.attrs[attr_key_layout] = layout_strings
+    node.attrs[attr_key_item_type] = type_str
+    node.attrs[attr_key_length] = len(l)
+    save_dataset(np.frombuffer(data, dtype=np.uint8) if len(data) > 0
+                 else np.zeros(0, dtype=np.uint8), node, 'data', memo)
+    save_dataset(offsets, node, 'offsets', memo)
+
+
+def is_column(l):
+    r"""
+    Whether ``l`` can be a column of a list of instances saved by column:
+    scalars of one packable type, strings (or bytes) of one type, or arrays
+    without objects in them. None of these refer to other objects, and the
+    first two are always saved in one dataset (as are the arrays, if they are
+    all of one shape and dtype).
+    """
+    return (packed_dtype(l) is not None or strings_type_str(l) is not None or
+            all(type(a) is np.ndarray and not a.dtype.hasobject for a in l))
+
+
+def records_dtype(l, memo):
+    r"""
+    The compound dtype the tuples (or namedtuples) ``l`` can be saved as,
+    along with the class of the namedtuples - or ``None`` if ``l`` is empty
+    or is not made up of tuples of one (unregistered) type and length whose
+    items in each place are of one packable scalar type.
+    """
+    if len(l) == 0:
+        return None
+    type_0 = type(l[0])
+    if type_0 is tuple:
+        cls = None
+    elif (issubclass(type_0, tuple) and hasattr(type_0, '_fields') and
+            type_0 not in type_to_exporter and type_0 not in memo.exporters):
+        # a namedtuple - which has to reduce to just its class and items to
+        # be made again from them
+        reduction = pickle_save(l[0])
+        if (type(reduction) is not dict or
+                set(reduction) != {r_key_cls, r_key_args} or
+                reduction[r_key_args] != tuple(l[0])):
+            return None
+        cls = reduction[r_key_cls]
+    else:
+        return None
+    types_0 = [type(x) for x in l[0]]
+    if (len(types_0) == 0 or
+            not all(type(t) is type_0 and len(t) == len(types_0) and
+                    all(type(x) is t_i for x, t_i in zip(t, types_0))
+                    for t in l)):
+        return None
+    dtypes = [packed_dtypes.get(t) for t in types_0]
+    if any(dtype is None for dtype in dtypes):
+        return None
+    names = (list(type_0._fields) if cls is not None else
+             ['f{}'.format(i) for i in range(len(dtypes))])
+    return np.dtype([(str(k), d) for k, d in zip(names, dtypes)]), cls
+
+
+def instance_columns(l, memo):
+    r"""
+    The class of the instances ``l`` is made up of, the type of the keys of
+    their states, and a list of ``(key, values)`` columns of their states -
+    or ``None`` if ``l`` isn't two or more distinct instances, none of which
+    have been saved already, of one class whose reductions are just a state
+    dict with the same keys, each of which has values that are saved in one
+    go (see :func:`is_column`).
+    """
+    if len(l) < 2:
+        return None
+    type_0 = type(l[0])
+    if (type_0 in type_to_exporter or type_0 in memo.exporters or
+            not all(type(x) is type_0 and id(x) not in memo for x in l) or
+            len(set(id(x) for x in l)) != len(l)):
+        return None
+    reductions = [pickle_save(x) for x in l]
+    # if they aren't saved by column, each is reduced again as it's saved,
+    # unless the reduction made here is kept for it (see save_reducible)
+    memo.reductions.update(zip((id(x) for x in l), reductions))
+    reduction_0 = reductions[0]
+    if type(reduction_0) is not dict:
+        return None
+    fields = {r_key_cls, r_key_args, r_key_state}
+    if set(reduction_0) != fields or type(reduction_0[r_key_state]) is not dict:
+        return None
+    state_0 = reduction_0[r_key_state]
+    for r in reductions:
+        if (type(r) is not dict or set(r) != fields or len(r[r_key_args]) or
+                r[r_key_cls] != reduction_0[r_key_cls] or
+                type(r[r_key_state]) is not dict or
+                len(r[r_key_state]) != len(state_0)):
+            return None
+    keys = list(state_0)
+    names, key_type = node_names(keys)
+    if names is None:
+        return None
+    try:
+        columns = [(name, [r[r_key_state][k] for r in reductions])
+                   for name, k in zip(names, keys)]
+    except KeyError:
+        # not all the states have the same keys
+        return None
+    if not all(is_column(values) for _, values in columns):
+        return None
+    return reduction_0[r_key_cls], key_type, columns
+
+
+def save_columnar(l, columnar, parent, name, memo):
+    cls, key_type, columns = columnar
+    node = parent.create_group(name)
+    node.attrs[attr_key_layout] = layout_columnar
+    node.attrs[attr_key_reduction_cls] = global_index(cls, memo)
+    node.attrs[attr_key_key_type] = key_type
+    node.attrs[attr_key_length] = len(l)
+    # the columns are made here, so have to be kept alive
+    memo.keep_alive(columns)
+    for k, values in columns:
+        h5_export(values, node, k, memo)
+    # each instance can still be found again elsewhere, as an item of the
+    # list (see export_node)
+    for i, x in enumerate(l):
+        memo[id(x)] = (node.name, i)
+        del memo.reductions[id(x)]
+
+
+def is_stackable(l, memo):
+    r"""
+    Whether ``l`` is two or more distinct arrays of the same shape and dtype,
+    none of which has been saved already, and so can be saved stacked.
+    """
+    if len(l) < 2 or type(l[0]) is not np.ndarray or l[0].dtype.hasobject:
+        return False
+    shape, dtype = l[0].shape, l[0].dtype
+    return (all(type(a) is np.ndarray and a.shape == shape and
+                a.dtype == dtype and id(a) not in memo for a in l) and
+            len(set(id(a) for a in l)) == len(l))
+
+
 def save_list(l, parent, name, memo):
+    if is_stackable(l, memo):
+        save_dataset(np.array(l), parent, name, memo)
+        node = parent[name]
+        node.attrs[attr_key_layout] = layout_stacked
+        # each array can still be found again elsewhere, as a slice of the
+        # stack (see export_node)
+        for i, a in enumerate(l):
+            memo[id(a)] = (node.name, i)
+        return
+    dtype = packed_dtype(l)
+    if dtype is not None:
+        try:
+            a = np.array(l, dtype=dtype)
+        except OverflowError:
+            # ints too big for int64 - fall back to one node per element
+            pass
+        else:
+            save_dataset(a, parent, name, memo)
+            parent[name].attrs[attr_key_layout] = layout_packed
+            return
+    type_str = strings_type_str(l)
+    if type_str is not None:
+        save_strings(l, type_str, parent, name, memo)
+        return
+    records = records_dtype(l, memo)
+    if records is not None:
+        dtype, cls = records
+        try:
+            # numpy takes a tuple of tuples as one record, so it has to be
+            # handed a list
+            a = np.array(list(l), dtype=dtype)
+        except OverflowError:
+            # ints too big for int64 - fall back to one node per element
+            pass
+        else:
+            save_dataset(a, parent, name, memo)
+            node = parent[name]
+            node.attrs[attr_key_layout] = layout_records
+            if cls is not None:
+                node.attrs[attr_key_reduction_cls] = global_index(cls, memo)
+            return
+    if memo.columnar:
+        columnar = instance_columns(l, memo)
+        if columnar is not None:
+            save_columnar(l, columnar, parent, name, memo)
+            return
     list_node = parent.create_group(name)
+    list_node.attrs[attr_key_length] = len(l)
     padded = zero_padded(len(l))
     for i, x in enumerate(l):
         h5_export(x, list_node, padded.format(i), memo)
 
 
-is_string_keyed_dict = lambda d: (sum(not isinstance(k, strType)
-                                      for k in d.keys()) == 0)
+# HDF5 link names can't be empty, '.', or contain a '/' or a null
+is_valid_node_name = lambda k: (isinstance(k, strType) and k not in ('', '.')
+                                and '/' not in k and '\0' not in k)
 
 
-def save_unicode_dict(d, parent, name, memo):
+def node_names(keys):
+    r"""
+    The node names the string ``keys`` can be saved under, and the type str
+    of the keys - or ``(None, None)`` if they can't all be node names. Text
+    keys are their own names. On Python 2, byte string keys (such as the
+    attribute names in an instance ``__dict__``) are named by their text if
+    they are ASCII, and made byte strings again on load.
+    """
+    key_type = strings_type_str(keys)
+    if key_type == 'str':
+        names = keys
+    elif key_type == 'py2_bytes':
+        try:
+            names = [k.decode('ascii') for k in keys]
+        except UnicodeDecodeError:
+            return None, None
+    else:
+        return None, None
+    if not all(is_valid_node_name(k) for k in names):
+        return None, None
+    return names, key_type
+
+
+def save_unicode_dict(d, names, key_type, parent, name, memo):
     dict_node = parent.create_group(name)
-    if not is_string_keyed_dict(d):
-        raise ValueError("Only dictionaries with string keys can be "
-                         "serialized")
-    for k, v in d.items():
-        h5_export(v, dict_node, str(k), memo)
+    if key_type != 'str':
+        # the keys are made again from their names (see load_unicode_dict)
+        dict_node.attrs[attr_key_key_type] = key_type
+    for k, node_name in zip(d, names):
+        h5_export(d[k], dict_node, node_name, memo)
 
 
 def save_dict(d, parent, name, memo):
+    keys = list(d)
+    names, key_type = node_names(keys) if len(keys) else ([], 'str')
+    if names is not None:
+        # every key can be a node name - store the values directly under
+        # their keys rather than as (k, v) tuples
+        save_unicode_dict(d, names, key_type, parent, name, memo)
+        return type_str_unicode_dict
     dict_node = parent.create_group(name)
-    for k, v in d.items():
-        h5_export((k, v), dict_node, str(hash(k)), memo)
+    for item in d.items():
+        memo.keep_alive(item)
+        h5_export(item, dict_node, str(hash(item[0])), memo)
 
 
 def save_reducible(x, parent, name, memo):
     # save down the object: we'll either get back a global or a reduction state
-    reduction = pickle_save(x)
+    reduction = memo.reductions.pop(id(x), None)
+    if reduction is None:
+        reduction = pickle_save(x)
     if type(reduction) == GlobalTuple:
         save_global(reduction, parent, name, memo)
         return
 
-    # Reduction is a dict that is ready to directly be saved. Let's make a
+    # Reduction is a dict that is ready to directly be saved. Its parts may
+    # well have been made just now, so have to be kept alive. Let's make a
     # group
+    memo.keep_alive(reduction)
     node = parent.create_group(name)
 
     if r_key_cls in reduction:
-        cls_module, cls_name = reduction[r_key_cls]
-        node.attrs[attr_key_reduction_cls_module] = cls_module
-        node.attrs[attr_key_reduction_cls_name] = cls_name
+        node.attrs[attr_key_reduction_cls] = global_index(
+            reduction[r_key_cls], memo)
     elif r_key_func in reduction:
-        func_module, func_name = reduction[r_key_func]
-        node.attrs[attr_key_reduction_func_module] = func_module
-        node.attrs[attr_key_reduction_func_name] = func_name
+        node.attrs[attr_key_reduction_func] = global_index(
+            reduction[r_key_func], memo)
     else:
         H5itPicklingError("reduction state is missing a 'func' or 'cls'")
 
@@ -264,16 +966,65 @@ def save_reducible(x, parent, name, memo):
         h5_export(reduction[r_key_dictitems], node, r_key_dictitems, memo)
 
 
-def save_global(g, parent, name, _):
+def global_index(g, memo):
+    r"""
+    The index of the global ``(module, name)`` ``g`` in the table of globals
+    for the file, adding it if it's new.
+    """
+    i = memo.globals.get(g)
+    if i is None:
+        i = memo.globals[g] = len(memo.globals)
+    return i
+
+
+def save_global(g, parent, name, memo):
     node = parent.create_group(name)  # A blank group
-    module, g_name = pickle_save_global(g)
-    node.attrs[attr_key_global_module] = module
-    node.attrs[attr_key_global_name] = g_name
+    # save_reducible hands over globals it has already resolved
+    if type(g) is not GlobalTuple:
+        g = pickle_save_global(g)
+    node.attrs[attr_key_global] = global_index(g, memo)
+
+
+def is_arena_array(a):
+    return (a.dtype.kind in 'biufc' and a.ndim > 0 and
+            0 < a.nbytes <= arena_max_size)
+
+
+def save_ndarray(a, parent, name, memo):
+    if memo.arena and is_arena_array(a):
+        # leave the data to be written out with the rest of the arena
+        dtype_str = as_unicode_str(a.dtype.str)
+        offset = memo.arena_sizes.get(dtype_str, 0)
+        memo.arenas.setdefault(dtype_str, []).append(a.ravel())
+        memo.arena_sizes[dtype_str] = offset + a.size
+        node = parent.create_group(name)
+        node.attrs[attr_key_layout] = layout_arena
+        node.attrs[attr_key_arena] = dtype_str
+        node.attrs[attr_key_arena_offset] = offset
+        node.attrs[attr_key_arena_shape] = np.array(a.shape, dtype=np.int64)
+        return
+    save_dataset(a, parent, name, memo)
+
+
+def save_dataset(a, parent, name, memo):
+    # only pay for working out the path if it could make a difference
+    path = relative_path(parent, name) if memo.chunking.overrides else None
+    kwargs = dataset_kwargs(a, memo.compression, memo.chunking, path=path)
+    if memo.threads > 1 and a.nbytes >= parallel_min_size:
+        # create it empty, so that we can fill in the chunks ourselves
+        dataset = parent.create_dataset(name, shape=a.shape, dtype=a.dtype,
+                                        **kwargs)
+        write_parallel(dataset, a, memo.threads)
+    else:
+        parent.create_dataset(name, data=a, **kwargs)
 
 
-def save_ndarray(a, parent, name, _):
-    # fletcher32 is a checksum, gzip compression is supported by Matlab
-    parent.create_dataset(name, data=a, compression='gzip', fletcher32=True)
+def save_stacked_item(stack_item, parent, name):
+    path, i = stack_item
+    node = parent.create_group(name)
+    node.attrs[attr_key_stack_path] = path
+    node.attrs[attr_key_stack_index] = i
+    node.attrs[attr_key_type] = type_str_stacked_item
 
 
 def save_none(none, parent, name, _):
@@ -339,33 +1090,253 @@ for t in types:
     str_to_importer[t.str] = t.importer
     type_to_str[t.type] = t.str
 
-# add on the reduction importer
+string_type_strs = {'str', 'py2_bytes', 'bytes'}
+dict_type_strs = {'dict', type_str_unicode_dict}
+
+# the types that dump(..., inline=True) saves as attributes
+inline_types = {type(None), bool}
+inline_types.update(numberTypes)
+
+# add on the importers for types that have more than one layout
 str_to_importer[attr_key_type_reduction] = load_reducible
+str_to_importer[type_str_unicode_dict] = load_unicode_dict
+str_to_importer[type_str_stacked_item] = load_stacked_item
 
+# the types (and type strs) h5it saves itself, which can't be registered
+builtin_types = frozenset(type_to_exporter)
+builtin_type_strs = frozenset(str_to_importer)
 
-def link_path_if_softlink(node, name):
-    if node.get(name, getclass=True, getlink=True) == h5py.SoftLink:
-        # this node is a softlink - grab it's path
-        return node.get(name, getlink=True).path
 
+def check_registration(cls, tag):
+    if cls in builtin_types:
+        raise ValueError("h5it saves {} itself, so it can't be "
+                         "registered".format(cls))
+    if tag in builtin_type_strs:
+        raise ValueError("'{}' is the type str of a type h5it saves "
+                         "itself".format(tag))
 
-def h5_import(parent, name, memo, encoding):
-    link_path = link_path_if_softlink(parent, name)
+
+def register(cls, exporter, importer, tag):
+    r"""
+    Save and load instances of ``cls`` with the given functions, rather than
+    through ``__reduce__``. Only instances of exactly ``cls`` are affected,
+    not of its subclasses.
+
+    Parameters
+    ----------
+    cls : `type`
+        The class to register.
+    exporter : `callable`
+        Called as ``exporter(x, parent, name, memo)`` to save instance ``x``
+        as a new group or dataset called ``name`` in the `h5py.Group`
+        ``parent``. ``memo`` holds the settings of the ``dump`` and can be
+        ignored.
+    importer : `callable`
+        Called as ``importer(parent, name, memo, encoding)`` to load an
+        instance from ``parent[name]``. The node has an ``attrs`` `dict`,
+        and a dataset is read as an `h5py.Dataset` is (``node[()]``,
+        ``node[:10]``, ``node.shape``, ``node.dtype``), or through its
+        ``dataset`` (the `h5py.Dataset` itself). ``memo`` and ``encoding``
+        can be ignored.
+    tag : `str`
+        Saved as the type of the node, to find the importer by on load.
+
+    Raises
+    ------
+    ValueError
+        If ``cls`` (or ``tag``) is one that h5it saves itself.
+    """
+    check_registration(cls, tag)
+    type_to_exporter[cls] = exporter
+    type_to_str[cls] = tag
+    str_to_importer[tag] = importer
+
+
+# the types whose subclasses can be saved as them, with the subclass recorded
+subclassable_types = {list, tuple, dict, np.ndarray, strType, float, complex}
+subclassable_types.update(intTypes)
+subclassable_types.update(t for t in (py2_bytesType, py3_bytesType)
+                          if isinstance(t, type))
+
+# defining any of these means a class is particular about how it is pickled,
+# so its instances are reduced just as pickle would
+pickling_hooks = ('__reduce__', '__reduce_ex__', '__getstate__',
+                  '__setstate__', '__getnewargs__', '__getnewargs_ex__')
+
+def customises_pickling(cls):
+    cls_dict = vars(cls)
+    return (any(hook in cls_dict for hook in pickling_hooks) or
+            bool(cls_dict.get('__slots__')))
+
+
+def native_base(t):
+    r"""
+    The type in ``subclassable_types`` that instances of ``t`` (that has no
+    exporter of its own) are saved as - the first of them in its MRO - or
+    ``None`` if they are reduced. They are reduced if ``t`` isn't a subclass
+    of one, or if any class in its MRO that the base doesn't have customises
+    pickling.
+    """
+    base = None
+    mro = getattr(t, '__mro__', ())
+    for cls in mro:
+        if cls in subclassable_types:
+            # classes after the base in the MRO can customise pickling too
+            # (Enum does, for IntEnum), so check everything it doesn't have
+            extra = [c for c in mro if c not in cls.__mro__]
+            if (t not in copyreg_dispatch_table and
+                    not any(customises_pickling(c) for c in extra)):
+                base = cls
+            break
+    return base
+
+
+def exporters_from(dispatch_table):
+    r"""
+    The ``{cls: (exporter, tag)}`` to save by for a ``dump`` with
+    ``dispatch_table`` (see :func:`dump`).
+    """
+    exporters = {}
+    for cls, (exporter, _, tag) in (dispatch_table or {}).items():
+        check_registration(cls, tag)
+        exporters[cls] = (exporter, tag)
+    return exporters
+
+
+def importers_from(dispatch_table):
+    r"""
+    The ``{tag: importer}`` to load by for a load with ``dispatch_table``
+    (see :func:`dump`).
+    """
+    importers = {}
+    for cls, (_, importer, tag) in (dispatch_table or {}).items():
+        check_registration(cls, tag)
+        importers[tag] = importer
+    return importers
+
+
+class Excluded(object):
+    r"""
+    Stands in for a part of the saved object that was left out of a load by
+    the ``include`` or ``exclude`` arguments of :func:`open`.
+
+    Parameters
+    ----------
+    path : `str`
+        The path of the node that was not loaded, e.g. ``'0/pixels'``.
+    """
+    __slots__ = ('path',)
+
+    def __init__(self, path):
+        self.path = path
+
+    def __repr__(self):
+        return 'Excluded({!r})'.format(self.path)
+
+
+class ImportMemo(dict):
+    r"""
+    Maps node paths to the objects imported from them. As it is handed to
+    every importer, it also carries the settings for the current load.
+    """
+
+    def __init__(self, lazy=False, mmap=False, include=None, exclude=None,
+                 threads=1, copy_views=False, dispatch_table=None):
+        dict.__init__(self)
+        self.importers = importers_from(dispatch_table)
+        self.lazy = lazy
+        self.mmap = mmap
+        self.copy_views = copy_views
+        # dtype str -> arena (or the dataset holding it, if the load is lazy),
+        # for those read so far
+        self.arenas = {}
+        # the file's table of globals, once read, and index in it -> global,
+        # for those looked up so far
+        self.global_table = None
+        self.globals = {}
+        self.threads = threads
+        self.include = include
+        self.exclude = [] if exclude is None else exclude
+        self.filtering = include is not None or len(self.exclude) > 0
+        # the paths of the nodes whose importers are waiting on children
+        self.in_progress = set()
+
+    def is_excluded(self, path, is_array):
+        r"""
+        Whether the node at ``path`` should be left out. ``is_array`` says
+        whether it holds arrays.
+        """
+        if any(fnmatchcase(path, p) for p in self.exclude):
+            return True
+        # include only ever leaves out arrays - everything else is the
+        # (cheap) structure needed to put the arrays that are loaded back in
+        # their place
+        return (self.include is not None and is_array and
+                not any(fnmatchcase(path, p) or fnmatchcase(path, p + '/*')
+                        for p in self.include))
+
+
+def begin_import(parent, name, memo, encoding, stack, filtering=filter_all):
+    r"""
+    Import node ``name`` of ``parent`` if it can be done in one go. Otherwise
+    push the generator importing it onto ``stack`` (with the path to memoize
+    the result under, and whether its children are filtered) and return
+    `pending`. ``filtering`` says how the load's filters apply (see
+    `Child`).
+    """
+    filtered = memo.filtering and filtering == filter_all
+    inlined = parent.attrs.get(inline_key(name))
+    if inlined is not None:
+        # saved as an attribute of the parent - there is no node to look up
+        if filtered:
+            path = relative_path(parent, name)
+            if memo.is_excluded(path, False):
+                return Excluded(path)
+        return load_inline(inlined)
+    if filtered:
+        # exclusion is by where a node is found, so has to come before the
+        # memo, which is by where a node actually lives
+        path = relative_path(parent, name)
+        node = parent[name]
+        is_array = (node.attrs.get(attr_key_type) == 'ndarray' or
+                    node.attrs.get(attr_key_layout) == layout_stacked)
+        # lazy arrays aren't read anyway, so stand in for excluded ones
+        if memo.is_excluded(path, is_array) and not (memo.lazy and is_array):
+            return Excluded(path)
+    # parent is a group of the TreeIndex for the file, so none of this goes
+    # back to the file
+    link_path = parent.link_target(name)
     if link_path is not None:
         # this node is a softlink - memoize the link destination path
         memo_path = link_path
     else:
-        memo_path = parent[name].name
+        memo_path = parent[name].path
     if memo_path in memo:
-        # this object has already been loaded - just return it
+        # this object has already been loaded (or at least memoized while
+        # its children are loaded) - just return it
         return memo[memo_path]
     node = parent[name]
     type_ = node.attrs.get(attr_key_type)
+    # a tuple met again while its items are loaded is made again from them
+    # - what it contains itself through has been memoized already, so this
+    # doesn't recurse further (see load_tuple)
+    if memo_path in memo.in_progress and type_ != type_to_str[tuple]:
+        raise H5itUnpicklingError(
+            "Can't import {} - it contains itself, and is a type that can't "
+            "be made before its contents".format(memo_path))
     if type_ is not None:
-        # node type is specific
-        importer = str_to_importer.get(type_)
+        # node type is specific, and may be in the load's dispatch table
+        importer = memo.importers.get(type_, str_to_importer.get(type_))
         if importer is not None:
             obj = importer(parent, name, memo, encoding)
+            if attr_key_subclass in node.attrs:
+                obj = (subclassed(obj, node, memo)
+                       if isinstance(obj, GeneratorType)
+                       else as_subclass(node, obj, memo))
+            if isinstance(obj, GeneratorType):
+                memo.in_progress.add(memo_path)
+                stack.append((obj, memo_path, filtering != filter_none))
+                return pending
             # remember we imported this already
             memo[memo_path] = obj
             return obj
@@ -379,35 +1350,161 @@ def h5_import(parent, name, memo, encoding):
                                                            node))
 
 
+def h5_import(parent, name, memo, encoding):
+    # A stack of the importers waiting on a child, rather than recursion, so
+    # that there is no limit to how deeply objects can be nested
+    stack = []
+    obj = begin_import(parent, name, memo, encoding, stack)
+    while stack:
+        importer, memo_path, filtered = stack[-1]
+        # a pending importer has just been pushed and has to be started
+        step = importer.send(None if obj is pending else obj)
+        if isinstance(step, Child):
+            # nothing under a node that isn't filtered is filtered either
+            obj = begin_import(step.parent, step.name, memo, encoding, stack,
+                               step.filtering if filtered else filter_none)
+        else:
+            # the importer is done, and step is what it imported
+            stack.pop()
+            memo.in_progress.discard(memo_path)
+            # remember we imported this already
+            memo[memo_path] = step
+            obj = step
+    return obj
+
+
+class ExportMemo(dict):
+    r"""
+    Maps ``id(x)`` to the path of the node each object was exported to. As it
+    is handed to every exporter, it also carries the settings for the current
+    ``dump``.
+    """
+
+    def __init__(self, compression=default_compression,
+                 chunking=default_chunking, threads=1, inline=False,
+                 arena=False, columnar=False, dispatch_table=None):
+        dict.__init__(self)
+        self.compression = compression
+        self.chunking = chunking
+        self.threads = threads
+        self.inline = inline
+        self.arena = arena
+        self.columnar = columnar
+        self.exporters = exporters_from(dispatch_table)
+        # dtype str -> the flattened arrays in that arena, and their size
+        self.arenas = {}
+        self.arena_sizes = {}
+        # (module, name) -> index in the table of globals
+        self.globals = {}
+        # type -> what native_base gives for it, worked out the first time
+        # the type is saved in this dump (classes can change between dumps)
+        self.native_bases = {}
+        # id(x) -> the reduction of x, for instances reduced before they are
+        # saved
+        self.reductions = {}
+        self.temporaries = []
+        # while an exporter runs, the children it asks h5_export to save
+        self.children = None
+
+    def keep_alive(self, x):
+        r"""
+        Hold on to ``x`` until the ``dump`` is done. Everything in the object
+        being saved stays alive anyway, but objects that exporters make along
+        the way (and anything only they refer to) would otherwise die, and
+        later objects could reuse their ids and be mistaken for them.
+        """
+        self.temporaries.append(x)
+
+
+def relative_path(parent, name):
+    r"""
+    The path of node ``name`` of ``parent`` relative to the top level node,
+    e.g. ``'state/images'``. The top level node itself is ``''``.
+    """
+    return posixpath.join(parent.name, name)[len(top_level_path) + 1:]
+
+
 def h5_export(x, parent, name, memo):
+    if memo.children is not None:
+        # called by an exporter - save the child once the exporter is done,
+        # rather than recursing
+        memo.children.append((x, parent, name))
+        return
+    # A stack of the objects still to be saved, rather than recursion, so
+    # that there is no limit to how deeply objects can be nested. The
+    # children of each object are pushed in reverse so that they are popped
+    # in order, and everything is saved in the same order as by recursion.
+    stack = [(x, parent, name)]
+    try:
+        while stack:
+            memo.children = []
+            export_node(*stack.pop(), memo=memo)
+            stack.extend(reversed(memo.children))
+    finally:
+        memo.children = None
+
+
+def export_node(x, parent, name, memo):
+    if (memo.inline and type(x) in inline_types and
+            not isinstance(parent, h5py.File) and
+            len(parent.attrs) < inline_max_attrs):
+        # no need to memoize - the values are immutable, and saving them
+        # again is as cheap as linking to them
+        parent.attrs[inline_key(name)] = (type_to_str[type(None)] if x is None
+                                          else x)
+        return
     if id(x) in memo:
-        # this object is already exported, just softlink to it.
-        parent[name] = h5py.SoftLink(memo[id(x)].name)
+        target = memo[id(x)]
+        if isinstance(target, tuple):
+            # this array was saved in a stack, refer to its place in it
+            save_stacked_item(target, parent, name)
+        else:
+            # this object is already exported, just softlink to it.
+            parent[name] = h5py.SoftLink(target)
         return
     type_x = type(x)
-    exporter = type_to_exporter.get(type_x)
-    if exporter is None:
-        # use the pickle protocol to save a reducible/global
-        exporter = save_reducible
-        type_str = attr_key_type_reduction
+    # what the exporter saves, and the subclass (if any) it is saved as
+    native_x, subclass = x, None
+    registered = memo.exporters.get(type_x)
+    if registered is not None:
+        # the dump's dispatch table takes precedence
+        exporter, type_str = registered
     else:
-        type_str = type_to_str.get(type_x)
-    # definitely have type_str and exporter
-    exporter(x, parent, name, memo)
+        exporter = type_to_exporter.get(type_x)
+        if exporter is not None:
+            type_str = type_to_str.get(type_x)
+        else:
+            try:
+                base = memo.native_bases[type_x]
+            except KeyError:
+                base = memo.native_bases[type_x] = native_base(type_x)
+            if base is not None and (base is np.ndarray or
+                                     not getattr(x, '__dict__', None)):
+                # a plain subclass of a type we save ourselves, without
+                # attributes of its own (which pickle leaves off arrays)
+                exporter, type_str = type_to_exporter[base], type_to_str[base]
+                subclass = global_index(pickle_save_global(type_x), memo)
+                if base is np.ndarray:
+                    native_x = np.asarray(x)
+                elif base is not list and base is not dict:
+                    # h5py only knows the immutable types themselves
+                    native_x = base(x)
+            else:
+                # use the pickle protocol to save a reducible/global
+                exporter = save_reducible
+                type_str = attr_key_type_reduction
+    # definitely have type_str and exporter. Exporters that pick a
+    # specialised layout return the type_str for that layout.
+    layout_type_str = exporter(native_x, parent, name, memo)
+    if layout_type_str is not None:
+        type_str = layout_type_str
     new_node = parent[name]
     new_node.attrs[attr_key_type] = type_str
-    # remember we have exported this object
-    memo[id(x)] = new_node
-    # make sure that object doesn't die, as otherwise future objects
-    # might reuse the same id. We steal the standard lib approach, and
-    # just append on a special list in the memo (the list is stored on
-    # the hash of the memo, so we are pretty guaranteed that no one
-    # will use it!)
-    try:
-        memo[id(memo)].append(x)
-    except KeyError:
-        # I'm the first!
-        memo[id(memo)] = [x]
+    if subclass is not None:
+        new_node.attrs[attr_key_subclass] = subclass
+    # remember we have exported this object. Only the path is kept, so that
+    # the node itself can be closed.
+    memo[id(x)] = new_node.name
 
 
 def norm_path(path):
@@ -418,23 +1515,446 @@ def norm_path(path):
         os.path.expandvars(os.path.expanduser(as_unicode_str(path)))))
 
 
-def dump(x, path):
-    with h5py.File(norm_path(path), "w") as f:
-        h5_export(x, f, top_level_group_namespace, {})
+def write_arenas(f, memo):
+    r"""
+    Save the arrays ``dump(..., arena=True)`` set aside, one dataset per
+    dtype.
+    """
+    if len(memo.arenas) == 0:
+        return
+    group = f.create_group(arena_path)
+    for dtype_str, arrays in memo.arenas.items():
+        arena = np.concatenate(arrays)
+        group.create_dataset(dtype_str, data=arena,
+                             **dataset_kwargs(arena, memo.compression,
+                                              memo.chunking))
 
 
-def load_py2(path):
-    with h5py.File(norm_path(path), "r") as f:
-        # encoding is not used on Python 2, set to a dummy string
-        return h5_import(f, top_level_group_namespace, {}, '')
+def write_globals(f, memo):
+    r"""
+    Save the table of the ``(module, name)`` of every global referred to in
+    the file.
+    """
+    if len(memo.globals) == 0:
+        return
+    table = [None] * len(memo.globals)
+    for (module, name), i in memo.globals.items():
+        table[i] = [as_text(module), as_text(name)]
+    f.create_dataset(globals_path, data=np.array(table, dtype=object),
+                     dtype=h5py.special_dtype(vlen=as_unicode_str))
 
 
-def load_py3(path, encoding='ASCII'):
-    if encoding not in ['ASCII', 'bytes']:
-        raise H5itUnpicklingError("The only valid encodings are 'ASCII' or "
-                                  "'bytes'")
-    with h5py.File(norm_path(path), "r") as f:
-        return h5_import(f, top_level_group_namespace, {}, encoding)
+def write_consolidated_metadata(f):
+    r"""
+    Save the structure and attributes of everything in h5it file ``f`` to a
+    single dataset, so that loading can read them in one go rather than
+    walking the file.
+    """
+    index = TreeIndex(f)
+    index.add(top_level_path)
+    metadata = np.frombuffer(index.dumps(top_level_path), dtype=np.uint8)
+    f.create_dataset(consolidated_metadata_path, data=metadata,
+                     compression='gzip')
+
+
+def dump(x, path, compression=default_compression, chunks='auto', threads=1,
+         consolidated=False, inline=False, arena=False, columnar=False,
+         dispatch_table=None):
+    r"""
+    Save ``x`` to a new HDF5 file at ``path``.
+
+    Parameters
+    ----------
+    x : `object`
+        The object to save.
+    path : `str` or `pathlib.Path`
+        The file to write. Any existing file is overwritten.
+    compression : :class:`h5it.Compression`, ``{'gzip', 'lzf'}`` or ``None``, optional
+        How arrays are compressed. A codec name uses that codec with default
+        settings, and ``None`` disables compression and checksums entirely.
+    chunks : :class:`h5it.Chunking`, ``{'auto', 'leading'}``, `int` or `dict`, optional
+        How chunked arrays are split into chunks. A strategy name, a target
+        chunk size in bytes, or a `dict` of chunk shapes keyed by node path
+        (e.g. ``'state/images'``) are shorthands for the :class:`h5it.Chunking`
+        equivalent.
+    threads : `int`, optional
+        If more than ``1``, the chunks of large arrays are compressed on this
+        many threads and written directly. The file is no different to one
+        written with a single thread.
+    consolidated : `bool`, optional
+        If ``True``, the structure and attributes of every node are also
+        saved together in one dataset, which :func:`load` then reads in one
+        go instead of visiting every node in the file. Worthwhile for objects
+        made up of very many small parts.
+    inline : `bool`, optional
+        If ``True``, ``None``, bools and numbers inside lists, tuples, dicts
+        and objects are saved as attributes of the group of the container
+        rather than as a group each, which makes files of many small values
+        much smaller and quicker to load.
+    arena : `bool`, optional
+        If ``True``, numeric arrays of up to 16KB are saved one after another
+        in a single dataset per dtype, rather than as a dataset each. Each is
+        loaded as a view of that dataset, which is read whole the first time
+        one of its arrays is needed. Saves a lot of overhead for objects with
+        very many small arrays.
+    columnar : `bool`, optional
+        If ``True``, lists and tuples of instances of one class, whose states
+        are dicts with the same keys and values of one type - numbers,
+        strings or arrays - are saved as the class and a list of values for
+        each key, rather than as every instance in turn. Makes lists of many
+        small records much smaller and quicker to load.
+    dispatch_table : `dict`, optional
+        Maps classes to the ``(exporter, importer, tag)`` to save their
+        instances with, as :func:`h5it.register` does, but for just this
+        call. The same table has to be given to load the file.
+    """
+    memo = ExportMemo(compression=as_compression(compression),
+                      chunking=as_chunking(chunks), threads=threads,
+                      inline=inline, arena=arena, columnar=columnar,
+                      dispatch_table=dispatch_table)
+    try:
+        with h5py.File(norm_path(path), "w") as f:
+            h5_export(x, f, top_level_group_namespace, memo)
+            write_arenas(f, memo)
+            write_globals(f, memo)
+            if consolidated:
+                write_consolidated_metadata(f)
+    finally:
+        clear_global_caches()
+
+
+def open_for_read(path, rdcc_nbytes=None, rdcc_nslots=None):
+    r"""
+    Open ``path`` read only, optionally sizing the HDF5 chunk cache. Only the
+    cache settings that are given are passed on, so older h5py versions that
+    don't support them still work if they are left alone.
+    """
+    kwargs = {}
+    if rdcc_nbytes is not None:
+        kwargs['rdcc_nbytes'] = rdcc_nbytes
+    if rdcc_nslots is not None:
+        kwargs['rdcc_nslots'] = rdcc_nslots
+    return h5py.File(norm_path(path), "r", **kwargs)
+
+
+def split_key(key):
+    # either a path ('state/landmarks') or attribute style ('state.landmarks')
+    return [p for p in key.split('/' if '/' in key else '.') if p != '']
+
+
+def find_dict_item(node, part, encoding):
+    r"""
+    The ``(parent, name)`` of the value stored against the string key
+    ``part`` in a dict saved as ``(k, v)`` tuples, or ``None``.
+    """
+    for item in node.values():
+        if item.attrs.get(attr_key_layout) == layout_strings:
+            # a string key and value, saved packed - the value is item 1
+            k = load_string_item(item, 0, encoding)
+            if isinstance(k, bytes):
+                k = k.decode('utf-8', 'replace')
+            if k == part:
+                return item, 1
+            continue
+        if item.get('0', getclass=True) is not h5py.Dataset:
+            continue  # only string keys are stored as datasets
+        type_str = item['0'].attrs.get(attr_key_type)
+        if type_str not in string_type_strs:
+            continue
+        # the key is one small dataset - read it straight from the file,
+        # rather than indexing the item (value and all) to import it
+        k = str_to_importer[type_str](item, '0', None, encoding)
+        if isinstance(k, bytes):
+            k = k.decode('utf-8', 'replace')
+        if k == part:
+            return item, '1'
+
+
+def list_index(part, n):
+    r"""
+    The index ``part`` of a key gives into a list of length ``n`` (counting
+    negative indices from the end), or ``None`` if it isn't one.
+    """
+    try:
+        i = int(part)
+    except ValueError:
+        return None
+    return i % n if -n <= i < n else None
+
+
+def resolve_child(node, part, encoding):
+    r"""
+    The ``(parent, name)`` of the node that ``part`` of a key refers to under
+    ``node``. Besides plain child names, list and tuple items can be given
+    by index, and the attributes of reduced objects can be given directly
+    without going through ``'state'``. An item of a list of scalars saved
+    packed, of arrays saved stacked (or of tuples saved as records) is given
+    as the dataset and the item's index, and one of a list of strings saved
+    packed (or of instances saved by column) as the list's group and the
+    item's index (see :func:`resolve_item_part` for keys into them).
+    """
+    layout = node.attrs.get(attr_key_layout)
+    if (isinstance(node, h5py.Dataset) and
+            layout in (layout_packed, layout_stacked, layout_records)):
+        i = list_index(part, len(node))
+        if i is not None:
+            return node, i
+    if layout in (layout_strings, layout_columnar):
+        i = list_index(part, int(node.attrs[attr_key_length]))
+        if i is not None:
+            return node, i
+        # the children of these groups are how the items are stored, not
+        # items themselves
+        raise H5itUnpicklingError("Can't find '{}' in {} - its items are "
+                                  "given by index".format(part, node))
+    if not isinstance(node, h5py.Group):
+        raise H5itUnpicklingError("Can't look up '{}' - {} has no "
+                                  "children".format(part, node))
+    type_ = node.attrs.get(attr_key_type)
+    if type_ == 'dict':
+        item = find_dict_item(node, part, encoding)
+        if item is not None:
+            return item
+    elif has_child(node, part):
+        return node, part
+    if type_ == attr_key_type_reduction and r_key_state in node:
+        try:
+            return resolve_child(node[r_key_state], part, encoding)
+        except H5itUnpicklingError:
+            pass
+    if type_ in ('list', 'tuple'):
+        n = node.attrs.get(attr_key_length, len(node))
+        i = list_index(part, n)
+        if i is not None:
+            return node, zero_padded(n).format(i)
+    raise H5itUnpicklingError("Can't find '{}' in {}".format(part, node))
+
+
+def resolve_item_part(node, i, part, encoding):
+    r"""
+    The ``(parent, name)`` of the node that ``part`` of a key refers to in
+    item ``i`` of a list saved in one go in ``node``. Only instances saved by
+    column have parts, as items of their columns - the items of the other
+    layouts are taken whole.
+    """
+    if (node.attrs.get(attr_key_layout) != layout_columnar or
+            not has_child(node, part)):
+        raise H5itUnpicklingError("Can't find '{}' in item {} of {}".format(
+            part, i, node))
+    return resolve_child(node[part], as_unicode_str(i), encoding)
+
+
+def resolve_key(f, key, encoding):
+    r"""
+    The ``(parent, name)`` of the node ``key`` refers to in h5it file ``f``.
+    See :func:`open` for the syntax of keys.
+    """
+    parent, name = f, top_level_group_namespace
+    if '/' not in key and '.' in key:
+        # a name with dots in it (e.g. the dict key 'v1.2') is taken whole
+        # if there is one, before the key is taken to be attribute style
+        try:
+            return resolve_child(parent[name], key, encoding)
+        except H5itUnpicklingError:
+            pass
+    for part in split_key(key):
+        if isinstance(name, int):
+            parent, name = resolve_item_part(parent, name, part, encoding)
+        else:
+            parent, name = resolve_child(parent[name], part, encoding)
+    return parent, name
+
+
+class H5itFile(object):
+    r"""
+    An open h5it file and the object loaded from it. Used as a context
+    manager, it hands out the object and closes the file on exit. See
+    :func:`open`.
+    """
+
+    def __init__(self, path, key=None, include=None, exclude=None,
+                 lazy=False, mmap=False, threads=1, copy_views=False,
+                 encoding='ASCII', rdcc_nbytes=None, rdcc_nslots=None,
+                 dispatch_table=None):
+        if is_py2:
+            # encoding is not used on Python 2, set to a dummy string
+            encoding = ''
+        elif encoding not in ['ASCII', 'bytes']:
+            raise H5itUnpicklingError("The only valid encodings are 'ASCII' "
+                                      "or 'bytes'")
+        memo = ImportMemo(lazy=lazy, mmap=mmap, include=include,
+                          exclude=exclude, threads=threads,
+                          copy_views=copy_views,
+                          dispatch_table=dispatch_table)
+        self.file = open_for_read(path, rdcc_nbytes=rdcc_nbytes,
+                                  rdcc_nslots=rdcc_nslots)
+        try:
+            if key is None:
+                parent, name = self.file, top_level_group_namespace
+            else:
+                parent, name = resolve_key(self.file, key, encoding)
+            if (isinstance(parent, h5py.Dataset) and
+                    parent.attrs.get(attr_key_layout) == layout_records):
+                # the key is to one of a list of tuples saved as records
+                self.obj = load_records(parent, parent[name:name + 1],
+                                        memo)[0]
+            elif (isinstance(parent, h5py.Dataset) and
+                    parent.attrs.get(attr_key_layout) == layout_packed):
+                # the key is to one of a list of scalars saved packed
+                self.obj = parent[name:name + 1].tolist()[0]
+            elif isinstance(parent, h5py.Dataset):
+                # the key is to one of a list of arrays saved stacked
+                self.obj = LazyArray(parent, name) if lazy else parent[name]
+            elif parent.attrs.get(attr_key_layout) == layout_strings:
+                # the key is to one of a list of strings saved packed
+                self.obj = load_string_item(parent, name, encoding)
+            elif parent.attrs.get(attr_key_layout) == layout_columnar:
+                # the key is to one of a list of instances saved by column,
+                # which are only made all together
+                items = self.import_node(parent.parent,
+                                         posixpath.basename(parent.name),
+                                         memo, encoding)
+                self.obj = items[name]
+            elif inline_key(name) in parent.attrs:
+                # the key is to a value saved as an attribute of its parent
+                self.obj = load_inline(parent.attrs[inline_key(name)])
+            else:
+                self.obj = self.import_node(parent, name, memo, encoding)
+        except:
+            self.file.close()
+            raise
+        finally:
+            clear_global_caches()
+
+    def import_node(self, parent, name, memo, encoding):
+        # read the structure and attributes of everything under the node
+        # being loaded in one go (from the consolidated metadata, if it was
+        # saved), and import from that
+        index = TreeIndex(self.file)
+        if consolidated_metadata_path in self.file:
+            metadata = self.file[consolidated_metadata_path][()]
+            index.loads(metadata.tobytes())
+        parent = index.parent_of(posixpath.join(parent.name, name))
+        return h5_import(parent, name, memo, encoding)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self.obj
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def open(path, key=None, include=None, exclude=None, lazy=False, mmap=False,
+         threads=1, copy_views=False, encoding='ASCII', rdcc_nbytes=None,
+         rdcc_nslots=None, dispatch_table=None):
+    r"""
+    Load the object saved in the h5it file at ``path``, keeping the file open.
+    Use as a context manager::
+
+        with h5it.open(path, lazy=True) as x:
+            first_image = x.images[0]
+
+    Parameters
+    ----------
+    path : `str` or `pathlib.Path`
+        The file to load.
+    key : `str`, optional
+        Load just the part of the saved object at this path, e.g.
+        ``'state/landmarks'`` or ``'state.landmarks'``. Items of lists and
+        tuples are given by index (``'images/3'``), and attributes of reduced
+        objects can skip the ``'state'`` (``'landmarks'``). A key without a
+        ``'/'`` is first looked up as one name, so a dict key with dots in it
+        can be given as it is (``'v1.2'``). Further down, give such names in
+        a path (``'versions/v1.2'``). Only the nodes
+        under the key (and anything they reference) are read. By default the
+        whole object is loaded.
+    include : `list` of `str`, optional
+        Glob patterns over node paths (as for ``key``, relative to the saved
+        object, e.g. ``'*/landmarks'``). Only arrays at or under a matching
+        path are read, everything else is loaded as normal.
+    exclude : `list` of `str`, optional
+        Glob patterns over node paths. Anything at a matching path is not
+        read. Excluded (and not included) parts are replaced by
+        :class:`h5it.Excluded` placeholders, or by :class:`h5it.LazyArray`
+        proxies for arrays if ``lazy`` is ``True``. The parts objects can't be
+        made without are never left out - the keys of dicts, and the
+        arguments and list or dict items reduced objects are made from -
+        though the values of dicts and attributes of reduced objects can be.
+    lazy : `bool`, optional
+        If ``True``, arrays are not read into memory. They are loaded as
+        :class:`h5it.LazyArray` proxies that read from the file when indexed,
+        and are only usable until the file is closed.
+    mmap : `bool`, optional
+        If ``True``, arrays stored contiguous and unfiltered are loaded as
+        read only `numpy.memmap` views of the file instead of being read into
+        memory. They stay valid after the file is closed. See the
+        ``max_size`` argument of :class:`h5it.Compression` for writing big
+        arrays so that they qualify.
+    threads : `int`, optional
+        If more than ``1``, large gzip compressed arrays are read a raw chunk
+        at a time and decompressed on this many threads.
+    copy_views : `bool`, optional
+        Lists of arrays of the same shape and dtype are saved stacked in one
+        array, and small arrays saved with ``dump(..., arena=True)`` are
+        saved together in an arena. By default these are loaded as views into
+        the array holding them. If ``True``, each is copied out instead, so
+        that dropping some of them frees their memory.
+    encoding : ``{'ASCII', 'bytes'}``, optional
+        How byte strings saved on Python 2 are loaded on Python 3 - decoded
+        as ASCII, or left as `bytes`. Ignored on Python 2.
+    rdcc_nbytes : `int`, optional
+        The size in bytes of the HDF5 chunk cache for each dataset. Should be
+        big enough to hold the chunks touched by one read (see the ``chunks``
+        argument of :func:`dump`).
+    rdcc_nslots : `int`, optional
+        The number of hash table slots in the chunk cache. Ideally a prime
+        around 100 times the number of chunks that fit in the cache.
+    dispatch_table : `dict`, optional
+        The dispatch table the file was saved with, if any (see
+        :func:`dump`).
+
+    Returns
+    -------
+    h5it_file : :class:`H5itFile`
+        A context manager that gives the loaded object on entry, and closes
+        the file on exit.
+    """
+    return H5itFile(path, key=key, include=include, exclude=exclude,
+                    lazy=lazy, mmap=mmap, threads=threads,
+                    copy_views=copy_views, encoding=encoding,
+                    rdcc_nbytes=rdcc_nbytes, rdcc_nslots=rdcc_nslots,
+                    dispatch_table=dispatch_table)
+
+
+def load_py2(path, key=None, include=None, exclude=None, mmap=False,
+             threads=1, copy_views=False, rdcc_nbytes=None,
+             rdcc_nslots=None, dispatch_table=None):
+    r"""
+    Load the object saved in the h5it file at ``path``. See :func:`open` for
+    the meaning of the arguments.
+    """
+    with open(path, key=key, include=include, exclude=exclude, mmap=mmap,
+              threads=threads, copy_views=copy_views,
+              rdcc_nbytes=rdcc_nbytes, rdcc_nslots=rdcc_nslots,
+              dispatch_table=dispatch_table) as x:
+        return x
+
+
+def load_py3(path, encoding='ASCII', key=None, include=None, exclude=None,
+             mmap=False, threads=1, copy_views=False, rdcc_nbytes=None,
+             rdcc_nslots=None, dispatch_table=None):
+    r"""
+    Load the object saved in the h5it file at ``path``. See :func:`open` for
+    the meaning of the arguments.
+    """
+    with open(path, key=key, include=include, exclude=exclude, mmap=mmap,
+              threads=threads, copy_views=copy_views, encoding=encoding,
+              rdcc_nbytes=rdcc_nbytes, rdcc_nslots=rdcc_nslots,
+              dispatch_table=dispatch_table) as x:
+        return x
 
 if is_py3:
     load = load_py3
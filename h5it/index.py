@@ -0,0 +1,342 @@
+from __future__ import unicode_literals
+
+import json
+import posixpath
+
+import numpy as np
+import h5py
+from h5py import h5a, h5g, h5o, h5l, h5s
+
+
+def as_str(name):
+    # the low level API hands back bytes on Python 3
+    return name.decode('utf-8') if isinstance(name, bytes) else name
+
+
+text_type = type('')  # unicode on Python 2, thanks to unicode_literals
+
+# the kinds of row in a consolidated metadata table
+kind_group, kind_dataset, kind_link = 0, 1, 2
+
+
+def join(path, name):
+    # posixpath.join, without the generality that dominates its cost here
+    return path + '/' + name if path != '/' else '/' + name
+
+
+def read_attrs(oid):
+    r"""
+    All the attributes of the object ``oid`` (a low level object id), as
+    `h5py.AttributeManager` would give them. Going through the low level API
+    saves making a high level object for every node.
+    """
+    attrs = {}
+    for i in range(h5a.get_num_attrs(oid)):
+        aid = h5a.open(oid, index=i)
+        if aid.get_space().get_simple_extent_type() == h5s.NULL:
+            value = h5py.Empty(aid.dtype)
+        else:
+            a = np.empty(aid.shape, dtype=aid.dtype)
+            aid.read(a)
+            value = a[()]  # scalars come back as scalars, as from h5py
+        attrs[as_str(aid.name)] = value
+    return attrs
+
+
+def encode_attr(value):
+    r"""
+    ``value`` as something JSON can hold exactly. Strings are stored as they
+    are, and numpy scalars and numeric arrays along with their dtype. Raises
+    `ValueError` for anything else.
+    """
+    if isinstance(value, text_type):
+        return value
+    if (isinstance(value, np.ndarray) and value.dtype.kind in 'biuf' and
+            value.dtype.itemsize <= 8):
+        return {'dtype': value.dtype.str, 'value': value.tolist()}
+    if (isinstance(value, np.generic) and value.dtype.kind in 'biufc' and
+            value.dtype.itemsize <= (16 if value.dtype.kind == 'c' else 8)):
+        x = value.item()
+        if value.dtype.kind == 'c':
+            x = [x.real, x.imag]
+        return {'dtype': value.dtype.str, 'value': x}
+    raise ValueError("Can't encode attribute {!r}".format(value))
+
+
+def decode_attr(x):
+    if isinstance(x, dict):
+        dtype = np.dtype(str(x['dtype']))
+        value = x['value']
+        if dtype.kind == 'c':
+            value = complex(*value)
+        return np.array(value, dtype=dtype)[()]
+    return x
+
+
+def encode_attrs(attrs):
+    r"""
+    ``attrs`` as a JSON-able `dict`, or ``None`` if any of them can't be
+    stored exactly, in which case they are read from the file instead.
+    """
+    try:
+        return dict((k, encode_attr(v)) for k, v in attrs.items())
+    except ValueError:
+        return None
+
+
+class IndexedNode(object):
+    r"""
+    The indexed copy of one node. ``path`` is where the node lives, and
+    ``name`` is where it was found - they differ under soft links, just as
+    ``h5py`` reports the name a node was opened by.
+    """
+    __slots__ = ('index', 'path', 'name', 'attrs')
+
+    def __init__(self, index, path, attrs, name=None):
+        self.index = index
+        self.path = path
+        self.name = path if name is None else name
+        self.attrs = attrs
+
+    @property
+    def file(self):
+        return self.index.file
+
+    def found_at(self, name):
+        return type(self)(self.index, self.path, self.attrs, name=name)
+
+    def __repr__(self):
+        return '<indexed {} "{}">'.format(self.kind, self.name)
+
+
+class IndexedGroup(IndexedNode):
+    r"""
+    A group in a :class:`TreeIndex`. Supports the parts of the `h5py.Group`
+    interface that the importers use, without touching the file.
+    """
+    __slots__ = ('children',)
+    kind = 'group'
+
+    def __init__(self, index, path, attrs, name=None, children=None):
+        IndexedNode.__init__(self, index, path, attrs, name=name)
+        self.children = [] if children is None else children
+
+    def found_at(self, name):
+        return IndexedGroup(self.index, self.path, self.attrs, name=name,
+                            children=self.children)
+
+    def __getitem__(self, key):
+        node = self.index[join(self.path, key)]
+        name = join(self.name, key)
+        return node if node.name == name else node.found_at(name)
+
+    def __contains__(self, key):
+        return join(self.path, key) in self.index
+
+    def __len__(self):
+        return len(self.children)
+
+    def __iter__(self):
+        return iter(self.children)
+
+    def keys(self):
+        return self.children
+
+    def values(self):
+        return [self[k] for k in self.children]
+
+    def link_target(self, key):
+        r"""
+        The path child ``key`` is a soft link to, or ``None`` if it is not
+        one.
+        """
+        return self.index.links.get(join(self.path, key))
+
+
+class IndexedDataset(IndexedNode):
+    r"""
+    A dataset in a :class:`TreeIndex`. Only its attributes are indexed -
+    the data is read from the file on demand, by indexing it as an
+    `h5py.Dataset`.
+    """
+    __slots__ = ()
+    kind = 'dataset'
+
+    @property
+    def dataset(self):
+        return self.index.file[self.path]
+
+    @property
+    def value(self):
+        return self.dataset[()]
+
+    @property
+    def shape(self):
+        return self.dataset.shape
+
+    @property
+    def dtype(self):
+        return self.dataset.dtype
+
+    def __getitem__(self, key):
+        return self.dataset[key]
+
+
+class TreeIndex(object):
+    r"""
+    The structure and attributes of (part of) an HDF5 file, read in one walk
+    so that loading doesn't have to go back to the file for every node.
+
+    Subtrees are added with :meth:`add`. Looking up a path that hasn't been
+    indexed yet (e.g. the target of a soft link out of the subtree being
+    loaded) indexes the subtree at that path first.
+
+    Parameters
+    ----------
+    f : `h5py.File`
+        The open file to index.
+    """
+
+    def __init__(self, f):
+        self.file = f
+        self.nodes = {}  # path -> IndexedGroup or IndexedDataset
+        self.links = {}  # path of soft link -> path it links to
+
+    def __contains__(self, path):
+        # groups are always indexed along with all their children, so this
+        # never has to go to the file
+        return path in self.nodes or path in self.links
+
+    def __getitem__(self, path):
+        node = self.nodes.get(path)
+        if node is not None:
+            return node
+        target = self.links.get(path)
+        if target is not None:
+            return self[target]
+        self.add(path)
+        return self[path]
+
+    def entry(self, path, oid):
+        attrs = read_attrs(oid)
+        if isinstance(oid, h5g.GroupID):
+            return IndexedGroup(self, path, attrs)
+        return IndexedDataset(self, path, attrs)
+
+    def add(self, path):
+        r"""
+        Index the node at ``path`` and everything under it.
+        """
+        if path in self.nodes or path in self.links:
+            return
+        link = self.file.get(path, getlink=True)
+        if link is None:
+            raise KeyError("Unable to open object (no node at '{}')".format(
+                path))
+        if isinstance(link, h5py.SoftLink):
+            self.links[path] = link.path
+            return
+        oid = h5o.open(self.file.id, path.encode('utf-8'))
+        self.nodes[path] = self.entry(path, oid)
+        if isinstance(oid, h5g.GroupID):
+            self.walk(path, oid)
+
+    def walk(self, path, gid):
+        r"""
+        Index everything under the group ``gid`` at ``path``. Each node is
+        opened from its parent by its own name - going by the path from
+        ``gid`` would make HDF5 resolve every level above it each time.
+        """
+        nodes, links = self.nodes, self.links
+        stack = [(path, gid)]
+        while stack:
+            path, gid = stack.pop()
+            prefix = path.rstrip('/') + '/'
+            children = nodes[path].children
+            names = []
+            # links come in name order. h5py reuses the info it hands over,
+            # so only the link type can be kept.
+            gid.links.iterate(
+                lambda name, info: names.append((name, info.type)), info=True)
+            for name, link_type in names:
+                children.append(as_str(name))
+                child = prefix + children[-1]
+                if link_type == h5l.TYPE_SOFT:
+                    links[child] = as_str(gid.links.get_val(name))
+                    continue
+                oid = h5o.open(gid, name)
+                nodes[child] = self.entry(child, oid)
+                if isinstance(oid, h5g.GroupID):
+                    stack.append((child, oid))
+
+    def rows(self, path):
+        r"""
+        The consolidated metadata for ``path`` and everything under it, as a
+        list of ``[path, kind, link target, attrs]`` rows, parents before
+        children and children in order.
+        """
+        rows = []
+        stack = [path]
+        while stack:
+            path = stack.pop()
+            target = self.links.get(path)
+            if target is not None:
+                rows.append([path, kind_link, target, None])
+                continue
+            node = self.nodes[path]
+            if isinstance(node, IndexedGroup):
+                rows.append([path, kind_group, None, encode_attrs(node.attrs)])
+                stack.extend(join(path, k) for k in reversed(node.children))
+            else:
+                rows.append([path, kind_dataset, None,
+                             encode_attrs(node.attrs)])
+        return rows
+
+    def add_rows(self, rows):
+        r"""
+        Index everything in the consolidated metadata ``rows`` (see
+        :meth:`rows`) without walking the file.
+        """
+        nodes, links = self.nodes, self.links
+        for path, kind, target, attrs in rows:
+            parent, base = path.rsplit('/', 1)
+            parent = nodes.get(parent or '/')
+            if parent is not None:
+                parent.children.append(base)
+            if kind == kind_link:
+                links[path] = target
+                continue
+            if attrs is None:
+                attrs = read_attrs(h5o.open(self.file.id,
+                                            path.encode('utf-8')))
+            else:
+                attrs = dict((k, decode_attr(v)) for k, v in attrs.items())
+            if kind == kind_group:
+                nodes[path] = IndexedGroup(self, path, attrs)
+            else:
+                nodes[path] = IndexedDataset(self, path, attrs)
+
+    def dumps(self, path):
+        r"""
+        The consolidated metadata for ``path`` and everything under it as
+        UTF-8 encoded JSON.
+        """
+        return json.dumps(self.rows(path), separators=(',', ':')).encode(
+            'utf-8')
+
+    def loads(self, b):
+        r"""
+        Index everything in the consolidated metadata ``b`` (see
+        :meth:`dumps`).
+        """
+        self.add_rows(json.loads(b.decode('utf-8')))
+
+    def parent_of(self, path):
+        r"""
+        A group standing in for the parent of ``path`` that only has
+        ``path`` as a child, so that ``path`` can be imported without
+        indexing its siblings.
+        """
+        self.add(path)
+        parent, name = posixpath.split(path)
+        return IndexedGroup(self, parent, {}, children=[name])
@@ -0,0 +1,76 @@
+from __future__ import unicode_literals
+
+import numpy as np
+
+
+class LazyArray(object):
+    r"""
+    A stand-in for a `numpy.ndarray` that reads from the HDF5 dataset backing
+    it only when indexed or converted with ``np.asarray``. Only valid while
+    the file it came from is open.
+
+    Parameters
+    ----------
+    dataset : `h5py.Dataset`
+        The dataset holding the array.
+    index : `int` or `slice`, optional
+        If given, the array is just ``dataset[index]``, e.g. one of a list of
+        arrays saved stacked in one dataset.
+    flat_shape : `tuple`, optional
+        If given, ``dataset[index]`` is the array flattened, and this is its
+        shape, e.g. for one of the small arrays saved in an arena.
+    """
+    __slots__ = ('dataset', 'index', 'flat_shape')
+
+    def __init__(self, dataset, index=None, flat_shape=None):
+        self.dataset = dataset
+        self.index = index
+        self.flat_shape = flat_shape
+
+    @property
+    def shape(self):
+        if self.flat_shape is not None:
+            return self.flat_shape
+        if self.index is not None:
+            return self.dataset.shape[1:]
+        return self.dataset.shape
+
+    @property
+    def dtype(self):
+        return self.dataset.dtype
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape))
+
+    @property
+    def nbytes(self):
+        return self.size * self.dataset.dtype.itemsize
+
+    def __len__(self):
+        if len(self.shape) == 0:
+            raise TypeError('len() of unsized object')
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        if self.flat_shape is not None:
+            # these are small - read the whole array to index it
+            return np.asarray(self)[key]
+        if self.index is not None:
+            key = (self.index,) + (key if isinstance(key, tuple) else (key,))
+        return self.dataset[key]
+
+    def __array__(self, dtype=None):
+        a = self.dataset[() if self.index is None else self.index]
+        # scalar datasets come back as numpy scalars
+        a = np.asarray(a)
+        if self.flat_shape is not None:
+            a = a.reshape(self.flat_shape)
+        return a if dtype is None else a.astype(dtype)
+
+    def __repr__(self):
+        return 'LazyArray(shape={}, dtype={})'.format(self.shape, self.dtype)
@@ -18,6 +18,12 @@ class H5itUnpicklingError(UnpicklingError):
 
 GlobalTuple = namedtuple(u'Global', (u'module', u'name'))
 
+# resolving a global searches sys.modules and imports, and the same few
+# classes are resolved again for every instance of them, so the results are
+# remembered - up to this many at a time, and only until the end of the dump
+# or load (see clear_global_caches)
+global_cache_size = 1024
+
 
 r_key_func = u'func'
 r_key_cls = u'cls'
@@ -38,6 +44,33 @@ if is_py3:
     from pickle import _getattribute, _compat_pickle
 
 
+def cache_globals(resolve):
+    r"""
+    ``resolve``, remembering what it returned for each set of arguments. Once
+    ``global_cache_size`` results are remembered they are all forgotten, so
+    that the cache stays small however many globals are resolved. Only
+    successful resolutions are remembered.
+    """
+    cache = {}
+
+    def cached_resolve(*args):
+        try:
+            return cache[args]
+        except KeyError:
+            pass
+        except TypeError:
+            # unhashable - can't be remembered
+            return resolve(*args)
+        result = resolve(*args)
+        if len(cache) >= global_cache_size:
+            cache.clear()
+        cache[args] = result
+        return result
+
+    cached_resolve.cache = cache
+    return cached_resolve
+
+
 # adapted from Python 3 save_global
 def save_global_py3(obj, name=None, proto=2, fix_imports=True):
 
@@ -158,7 +191,7 @@ def save_py3(obj, proto=2):
         except TypeError: # t is not a class (old Boost; see SF #502085)
             issc = False
         if issc:
-            return save_global_py3(obj)
+            return pickle_save_global(obj)
 
         # Check for a __reduce_ex__ method, fall back to __reduce__
         reduce = getattr(obj, "__reduce_ex__", None)
@@ -295,10 +328,10 @@ def save_reduce_py3(func, args, state=None, listitems=None, dictitems=None,
             raise PicklingError(
                 "args[0] from __newobj__ args has the wrong class")
         args = args[1:]
-        reduced[r_key_cls] = save_global_py3(cls)
+        reduced[r_key_cls] = pickle_save_global(cls)
         reduced[r_key_args] = args
     else:
-        reduced[r_key_func] = save_global_py3(func)
+        reduced[r_key_func] = pickle_save_global(func)
         reduced[r_key_args] = args
 
     # if obj is not None:
@@ -374,10 +407,10 @@ def save_reduce_py2(func, args, state=None, listitems=None, dictitems=None,
             raise PicklingError(
                 "args[0] from __newobj__ args has the wrong class")
         args = args[1:]
-        reduced[r_key_cls] = save_global_py2(cls)
+        reduced[r_key_cls] = pickle_save_global(cls)
         reduced[r_key_args] = args
     else:
-        reduced[r_key_func] = save_global_py2(func)
+        reduced[r_key_func] = pickle_save_global(func)
         reduced[r_key_args] = args
 
     # More new special cases (that work with older protocols as
@@ -487,15 +520,25 @@ def load_global_py2(module, name):
 
 
 if is_py2:
-    pickle_save_global = save_global_py2
+    pickle_save_global = cache_globals(save_global_py2)
     pickle_save = save_py2
     pickle_load_build = load_build_py2
-    pickle_load_global = load_global_py2
+    pickle_load_global = cache_globals(load_global_py2)
 elif is_py3:
-    pickle_save_global = save_global_py3
+    pickle_save_global = cache_globals(save_global_py3)
     pickle_save = save_py3
     pickle_load_build = load_build_py3
-    pickle_load_global = load_global_py3
+    pickle_load_global = cache_globals(load_global_py3)
+
+
+def clear_global_caches():
+    r"""
+    Forget every global resolved so far. Done at the end of each dump and
+    load, so that a class that is reloaded or replaced between them is
+    resolved afresh, rather than as the class it used to be.
+    """
+    pickle_save_global.cache.clear()
+    pickle_load_global.cache.clear()
 
 ############################### DISPATCH TABLES ###############################
 #
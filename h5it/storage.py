@@ -0,0 +1,462 @@
+# Policies deciding how numpy arrays are laid out on disk. Nothing in here
+# knows about the h5it object graph - these just turn an array into the
+# keyword arguments for h5py's create_dataset.
+from __future__ import unicode_literals
+
+import struct
+import sys
+import zlib
+from itertools import product
+from multiprocessing.pool import ThreadPool
+import numpy as np
+import h5py
+
+# HDF5 keeps compact datasets inside the object header, which is capped at
+# 64KB. Leave plenty of room for the attributes that share the header.
+compact_max_size = 16 * 1024
+
+codecs = (None, 'gzip', 'lzf')
+
+
+def compact_dcpl():
+    dcpl = h5py.h5p.create(h5py.h5p.DATASET_CREATE)
+    dcpl.set_layout(h5py.h5d.COMPACT)
+    return dcpl
+
+
+def leading_sample(a, n_bytes):
+    r"""
+    Up to ``n_bytes`` of contiguous leading-axis slices taken from the middle
+    of ``a``, as raw bytes.
+    """
+    row_bytes = max(a[0].nbytes, 1)
+    n_rows = max(n_bytes // row_bytes, 1)
+    start = max((a.shape[0] - n_rows) // 2, 0)
+    return np.ascontiguousarray(a[start:start + n_rows]).tobytes()
+
+
+def shuffled(b, itemsize):
+    r"""
+    ``b`` with the same byte transposition applied as HDF5's shuffle filter.
+    """
+    if itemsize == 1 or len(b) % itemsize != 0:
+        return b
+    return np.frombuffer(b, dtype=np.uint8).reshape(-1, itemsize).T.tobytes()
+
+
+class Compression(object):
+    r"""
+    How ``save_ndarray`` filters the arrays it writes.
+
+    Parameters
+    ----------
+    codec : ``{'gzip', 'lzf', None}``, optional
+        The compression filter to use. ``None`` disables compression.
+    level : `int`, optional
+        The gzip compression level (0-9). Ignored for other codecs.
+    shuffle : `bool`, optional
+        Apply the byte shuffle filter ahead of compression. Usually improves
+        the ratio on numeric data.
+    fletcher32 : `bool`, optional
+        Store a fletcher32 checksum with every chunk.
+    min_size : `int`, optional
+        Arrays smaller than this many bytes are written with no filters at
+        all, in the compact layout if they fit, otherwise contiguous.
+    max_size : `int`, optional
+        Arrays of at least this many bytes are written with no filters and
+        contiguous, so that they can be memory mapped by
+        ``load(..., mmap=True)``. By default there is no limit.
+    adaptive : `bool`, optional
+        If ``True``, a sample of every array is compressed first, and
+        compression is skipped for arrays that do not compress to at most
+        ``min_ratio`` of their size.
+    sample_size : `int`, optional
+        The number of bytes sampled when ``adaptive`` is ``True``.
+    min_ratio : `float`, optional
+        The compressed/raw size ratio a sample must reach for compression to
+        be used when ``adaptive`` is ``True``.
+    """
+
+    def __init__(self, codec='gzip', level=4, shuffle=False, fletcher32=True,
+                 min_size=0, max_size=None, adaptive=False,
+                 sample_size=64 * 1024, min_ratio=0.9):
+        if codec not in codecs:
+            raise ValueError('codec must be one of {}'.format(codecs))
+        self.codec = codec
+        self.level = level
+        self.shuffle = shuffle
+        self.fletcher32 = fletcher32
+        self.min_size = min_size
+        self.max_size = max_size
+        self.adaptive = adaptive
+        self.sample_size = sample_size
+        self.min_ratio = min_ratio
+
+    def __repr__(self):
+        return ('Compression(codec={!r}, level={}, shuffle={}, fletcher32={}, '
+                'min_size={}, max_size={}, adaptive={})'.format(
+            self.codec, self.level, self.shuffle, self.fletcher32,
+            self.min_size, self.max_size, self.adaptive))
+
+    def is_compressible(self, a):
+        r"""
+        Whether a sample of ``a`` compresses well enough to be worth it.
+        """
+        sample = leading_sample(a, self.sample_size)
+        if len(sample) == 0:
+            return False
+        if self.shuffle:
+            sample = shuffled(sample, a.dtype.itemsize)
+        # zlib at the cheapest level stands in for lzf, which has no Python
+        # binding we can rely on
+        level = self.level if self.codec == 'gzip' else 1
+        return len(zlib.compress(sample, level)) <= self.min_ratio * len(sample)
+
+    def dataset_kwargs(self, a):
+        r"""
+        The filter keyword arguments for ``create_dataset`` for array ``a``.
+        """
+        if a.ndim == 0 or a.size == 0 or a.nbytes < self.min_size:
+            # scalars can't be chunked, and tiny arrays aren't worth filtering
+            if 0 < a.nbytes <= compact_max_size:
+                return {'dcpl': compact_dcpl()}
+            return {}
+        if self.max_size is not None and a.nbytes >= self.max_size:
+            # big enough to be worth memory mapping - keep it raw
+            return {}
+        kwargs = {}
+        if self.fletcher32:
+            kwargs['fletcher32'] = True
+        if self.codec is not None and (not self.adaptive or
+                                       self.is_compressible(a)):
+            kwargs['compression'] = self.codec
+            if self.codec == 'gzip':
+                kwargs['compression_opts'] = self.level
+            if self.shuffle:
+                kwargs['shuffle'] = True
+        return kwargs
+
+
+# gzip for Matlab compatibility, fletcher32 checksums for safety
+default_compression = Compression()
+
+no_compression = Compression(codec=None, fletcher32=False)
+
+
+def as_compression(compression):
+    r"""
+    Normalise the ``compression`` argument of ``dump`` to a
+    :class:`Compression`. ``None`` means no compression, and a codec name
+    means that codec with default settings.
+    """
+    if compression is None:
+        return no_compression
+    elif isinstance(compression, Compression):
+        return compression
+    else:
+        return Compression(codec=compression)
+
+
+def memmap(dataset):
+    r"""
+    A read only `numpy.memmap` of ``dataset``, or ``None`` if it is not
+    stored as a single raw range of bytes in the file (i.e. it is filtered,
+    chunked, compact or not yet written) or can't be mapped.
+    """
+    dcpl = dataset.id.get_create_plist()
+    if (dcpl.get_layout() != h5py.h5d.CONTIGUOUS or dcpl.get_nfilters() > 0
+            or dataset.size == 0 or dataset.shape == ()
+            or dataset.dtype.hasobject or dataset.file.driver != 'sec2'):
+        return None
+    offset = dataset.id.get_offset()
+    if offset is None:
+        return None
+    # HDF5 addresses are relative to the end of the user block
+    return np.memmap(dataset.file.filename, dtype=dataset.dtype, mode='r',
+                     offset=dataset.file.userblock_size + offset,
+                     shape=dataset.shape)
+
+
+chunk_strategies = ('auto', 'leading', 'size')
+
+
+def clamp_chunks(chunks, shape):
+    # HDF5 won't take a chunk larger than a fixed size dataset or of size 0
+    return tuple(max(min(c, s), 1) for c, s in zip(chunks, shape))
+
+
+class Chunking(object):
+    r"""
+    How ``save_ndarray`` picks the chunk shape of the arrays it writes
+    chunked. Arrays are only chunked when they are filtered (see
+    :class:`Compression`) or when they have an explicit override.
+
+    Parameters
+    ----------
+    strategy : ``{'auto', 'leading', 'size'}``, optional
+        ``'auto'`` leaves the choice to h5py. ``'leading'`` makes every chunk
+        a single slice along the first axis, so reading ``a[i]`` touches one
+        chunk. ``'size'`` makes chunks of whole leading-axis slices that are
+        as close to ``target_size`` bytes as possible, splitting the trailing
+        axes when a single slice is larger than that.
+    target_size : `int`, optional
+        The chunk size in bytes aimed for by ``'size'``. Also used by
+        ``'leading'`` for 1D arrays, where one element per chunk would be
+        absurd.
+    overrides : `dict` of `str` to `tuple`, optional
+        Explicit chunk shapes keyed by node path, relative to the object
+        that was dumped, e.g. ``'state/images'``.
+    """
+
+    def __init__(self, strategy='auto', target_size=1024 * 1024,
+                 overrides=None):
+        if strategy not in chunk_strategies:
+            raise ValueError('strategy must be one of '
+                             '{}'.format(chunk_strategies))
+        self.strategy = strategy
+        self.target_size = target_size
+        self.overrides = {} if overrides is None else overrides
+
+    def __repr__(self):
+        return 'Chunking(strategy={!r}, target_size={}, overrides={!r})'.format(
+            self.strategy, self.target_size, self.overrides)
+
+    def sized_chunks(self, a):
+        row_bytes = a[0].nbytes
+        if row_bytes <= self.target_size:
+            n_rows = max(self.target_size // max(row_bytes, 1), 1)
+            return (n_rows,) + a.shape[1:]
+        # one slice is already too big - keep halving its largest axis
+        chunks = [1] + list(a.shape[1:])
+        while (np.prod(chunks) * a.dtype.itemsize > self.target_size and
+               max(chunks) > 1):
+            i = int(np.argmax(chunks))
+            chunks[i] = (chunks[i] + 1) // 2
+        return tuple(chunks)
+
+    def chunks(self, a, path, filtered):
+        r"""
+        The chunk shape for array ``a`` at node ``path``, or ``None`` to leave
+        the layout as is.
+        """
+        if a.ndim == 0 or a.size == 0:
+            return None
+        if path in self.overrides:
+            return clamp_chunks(self.overrides[path], a.shape)
+        if not filtered or self.strategy == 'auto':
+            return None
+        if self.strategy == 'leading' and a.ndim > 1:
+            return (1,) + a.shape[1:]
+        return clamp_chunks(self.sized_chunks(a), a.shape)
+
+
+default_chunking = Chunking()
+
+
+def as_chunking(chunks):
+    r"""
+    Normalise the ``chunks`` argument of ``dump`` to a :class:`Chunking`. A
+    strategy name, a target chunk size in bytes, or a `dict` of per-path
+    overrides are all accepted.
+    """
+    if isinstance(chunks, Chunking):
+        return chunks
+    elif isinstance(chunks, dict):
+        return Chunking(overrides=chunks)
+    elif isinstance(chunks, int) and not isinstance(chunks, bool):
+        return Chunking(strategy='size', target_size=chunks)
+    else:
+        return Chunking(strategy=chunks)
+
+
+def dataset_kwargs(a, compression, chunking, path=None):
+    r"""
+    All the storage keyword arguments for ``create_dataset`` for array ``a``
+    at node ``path``, as set by a :class:`Compression` and :class:`Chunking`.
+    """
+    kwargs = compression.dataset_kwargs(a)
+    filtered = len(kwargs) > 0 and 'dcpl' not in kwargs
+    chunks = chunking.chunks(a, path, filtered)
+    if chunks is not None:
+        # an explicit chunk shape trumps the compact layout
+        kwargs.pop('dcpl', None)
+        kwargs['chunks'] = chunks
+    return kwargs
+
+
+# The filters we can apply and undo ourselves on raw chunks, which lets
+# (de)compression run on many threads - zlib releases the GIL.
+python_filters = {h5py.h5z.FILTER_SHUFFLE, h5py.h5z.FILTER_DEFLATE,
+                  h5py.h5z.FILTER_FLETCHER32}
+
+# below this size the thread pool costs more than it saves
+parallel_min_size = 1024 * 1024
+
+# h5py's read_direct_chunk hands back over-long buffers on Python 2
+direct_chunk_reads = sys.version_info.major > 2
+
+
+def fletcher32(b):
+    r"""
+    The fletcher32 checksum of bytes ``b``, exactly as HDF5 computes it.
+    """
+    if len(b) % 2 == 1:
+        b += b'\0'
+    words = np.frombuffer(b, dtype='>u2')
+    n = len(words)
+    # HDF5 folds the running sums mod 65535 as it goes. All that matters to
+    # the result is the sums mod 65535 and whether they are zero, which can
+    # be worked out a block at a time.
+    sum1, sum2 = 0, 0
+    for start in range(0, n, 1024 * 1024):
+        w = words[start:start + 1024 * 1024].astype(np.uint64)
+        weights = np.arange(n - start, n - start - len(w), -1,
+                            dtype=np.uint64) % 65535
+        sum1 += int(w.sum())
+        sum2 = (sum2 + int((w * weights).sum() % 65535)) % 65535
+    if sum1 == 0:
+        return 0
+    return ((1 + (sum2 - 1) % 65535) << 16) | (1 + (sum1 - 1) % 65535)
+
+
+def unshuffled(b, itemsize):
+    r"""
+    ``b`` with HDF5's shuffle filter undone.
+    """
+    if itemsize == 1 or len(b) % itemsize != 0:
+        return b
+    return np.frombuffer(b, dtype=np.uint8).reshape(itemsize, -1).T.tobytes()
+
+
+def chunk_pipeline(dataset):
+    r"""
+    The ``(id, options)`` of the filters applied to each chunk of
+    ``dataset``, in the order they are applied on write, or ``None`` if it
+    isn't chunked or uses a filter we can't apply in Python.
+    """
+    if dataset.chunks is None or dataset.dtype.hasobject:
+        return None
+    dcpl = dataset.id.get_create_plist()
+    pipeline = []
+    for i in range(dcpl.get_nfilters()):
+        f, _, options, _ = dcpl.get_filter(i)
+        if f not in python_filters:
+            return None
+        pipeline.append((f, options))
+    return pipeline
+
+
+def encode_chunk(raw, pipeline, itemsize):
+    r"""
+    Apply the filters in ``pipeline`` to the raw bytes of a chunk.
+    """
+    for f, options in pipeline:
+        if f == h5py.h5z.FILTER_SHUFFLE:
+            raw = shuffled(raw, itemsize)
+        elif f == h5py.h5z.FILTER_DEFLATE:
+            raw = zlib.compress(raw, options[0])
+        elif f == h5py.h5z.FILTER_FLETCHER32:
+            raw += struct.pack('<I', fletcher32(raw))
+    return raw
+
+
+def decode_chunk(raw, filter_mask, pipeline, itemsize):
+    r"""
+    Undo the filters in ``pipeline`` on the raw bytes of a chunk. Filters
+    flagged in ``filter_mask`` were skipped for this chunk when it was
+    written.
+    """
+    for i in reversed(range(len(pipeline))):
+        f = pipeline[i][0]
+        if filter_mask & (1 << i):
+            continue
+        if f == h5py.h5z.FILTER_FLETCHER32:
+            raw, checksum = raw[:-4], struct.unpack('<I', raw[-4:])[0]
+            if fletcher32(raw) != checksum:
+                raise IOError('fletcher32 checksum mismatch in chunk')
+        elif f == h5py.h5z.FILTER_DEFLATE:
+            raw = zlib.decompress(raw)
+        elif f == h5py.h5z.FILTER_SHUFFLE:
+            raw = unshuffled(raw, itemsize)
+    return raw
+
+
+def chunk_offsets(shape, chunks):
+    return product(*[range(0, s, c) for s, c in zip(shape, chunks)])
+
+
+def chunk_region(offset, shape, chunks):
+    # chunks on the far edges hang over the end of the dataset
+    return tuple(slice(o, min(o + c, s))
+                 for o, c, s in zip(offset, chunks, shape))
+
+
+def read_parallel(dataset, threads):
+    r"""
+    Read the whole of ``dataset`` by reading its raw chunks and decoding them
+    on ``threads`` threads. Returns ``None`` if ``dataset`` is too small to
+    be worth it or can't be read this way, in which case it should just be
+    read as normal.
+    """
+    pipeline = chunk_pipeline(dataset)
+    if (pipeline is None or dataset.size * dataset.dtype.itemsize <
+            parallel_min_size or not direct_chunk_reads or
+            not hasattr(dataset.id, 'read_direct_chunk')):
+        return None
+    shape, chunks, dtype = dataset.shape, dataset.chunks, dataset.dtype
+    out = np.empty(shape, dtype=dtype)
+
+    def read_chunk(offset):
+        region = chunk_region(offset, shape, chunks)
+        try:
+            filter_mask, raw = dataset.id.read_direct_chunk(offset)
+        except (IOError, OSError):
+            # chunk was never written - let HDF5 work out what goes here
+            out[region] = dataset[region]
+            return
+        raw = decode_chunk(raw, filter_mask, pipeline, dtype.itemsize)
+        chunk = np.frombuffer(raw, dtype=dtype).reshape(chunks)
+        out[region] = chunk[tuple(slice(0, r.stop - r.start) for r in region)]
+
+    pool = ThreadPool(threads)
+    try:
+        pool.map(read_chunk, list(chunk_offsets(shape, chunks)))
+    finally:
+        pool.close()
+        pool.join()
+    return out
+
+
+def write_parallel(dataset, a, threads):
+    r"""
+    Write ``a`` to the empty chunked ``dataset`` by filtering its chunks on
+    ``threads`` threads and writing them raw. The chunks are identical to
+    those HDF5's own filters would write, so any reader can read them back.
+    Falls back to a normal write if ``dataset`` uses a filter we can't apply.
+    """
+    pipeline = chunk_pipeline(dataset)
+    if pipeline is None or not hasattr(dataset.id, 'write_direct_chunk'):
+        dataset[...] = a
+        return
+    chunks, dtype = dataset.chunks, dataset.dtype
+
+    def encode(offset):
+        region = chunk_region(offset, a.shape, chunks)
+        block = a[region]
+        if block.shape != chunks:
+            # edge chunks are still stored whole
+            padded = np.zeros(chunks, dtype=dtype)
+            padded[tuple(slice(0, r.stop - r.start) for r in region)] = block
+            block = padded
+        raw = np.ascontiguousarray(block, dtype=dtype).tobytes()
+        return offset, encode_chunk(raw, pipeline, dtype.itemsize)
+
+    pool = ThreadPool(threads)
+    try:
+        # writes have to go through h5py one at a time anyway, so do them
+        # here as the encoded chunks come back
+        for offset, raw in pool.imap(encode, chunk_offsets(a.shape, chunks)):
+            dataset.id.write_direct_chunk(offset, raw)
+    finally:
+        pool.close()
+        pool.join()
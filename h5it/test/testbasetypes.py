@@ -6,6 +6,7 @@ from nose.tools import raises
 import os
 from os.path import join as j
 import numpy as np
+import h5py
 from pathlib import (Path, PosixPath, PurePosixPath,
                      WindowsPath, PureWindowsPath)
 
@@ -260,6 +261,162 @@ def test_load_recursive_tuple():
     assert type(y) == tuple
 
 
+def test_load_packed_int_list():
+    x = list(range(1000))
+    dump(x, path)
+    y = load(path)
+    assert y == x
+    assert type(y) == list
+    assert all(type(i) == int for i in y)
+
+
+def test_load_packed_float_tuple():
+    x = tuple(np.random.rand(100).tolist())
+    dump(x, path)
+    y = load(path)
+    assert y == x
+    assert type(y) == tuple
+
+
+def test_load_packed_bool_list():
+    x = [True, False, False, True]
+    dump(x, path)
+    y = load(path)
+    assert y == x
+    assert all(type(i) == bool for i in y)
+
+
+def test_load_packed_complex_list():
+    x = [1 + 2j, -3.5j, 4 + 0j]
+    dump(x, path)
+    y = load(path)
+    assert y == x
+    assert all(type(i) == complex for i in y)
+
+
+def test_load_mixed_bool_int_list_keeps_types():
+    x = [1, True, 0, False]
+    dump(x, path)
+    y = load(path)
+    assert y == x
+    assert [type(i) for i in y] == [int, bool, int, bool]
+
+
+def test_load_list_of_ints_too_large_to_pack():
+    x = [2 ** 63, 2 ** 63 + 1]
+    dump(x, path)
+    y = load(path)
+    assert y == x
+
+
+def test_packed_list_is_single_dataset():
+    dump([1.5, 2.5, 3.5], path)
+    with h5py.File(path, 'r') as f:
+        assert isinstance(f['h5it'], h5py.Dataset)
+
+
+def test_load_packed_str_list():
+    x = ['a', '', 'caf\xe9', '\u4e2d\u6587', 'a']
+    dump(x, path)
+    with h5py.File(path, 'r') as f:
+        assert sorted(f['h5it'].keys()) == ['data', 'offsets']
+    y = load(path)
+    assert y == x
+    assert all(type(i) == type(x[0]) for i in y)
+
+
+def test_load_packed_str_tuple():
+    x = tuple('word{}'.format(i) for i in range(500))
+    dump(x, path)
+    y = load(path)
+    assert y == x
+    assert type(y) == tuple
+
+
+def test_load_packed_bytes_list():
+    x = [b'\x00\x01', b'', b'abc\x00']
+    dump(x, path)
+    y = load(path)
+    assert y == x
+    assert all(type(i) == bytes for i in y)
+
+
+def test_load_packed_empty_strs():
+    x = ['', '']
+    dump(x, path)
+    assert load(path) == x
+
+
+def test_load_list_of_records():
+    x = [(i, i * 0.5, i % 2 == 0, 1j * i) for i in range(100)]
+    dump(x, path)
+    with h5py.File(path, 'r') as f:
+        assert isinstance(f['h5it'], h5py.Dataset)
+        assert f['h5it'].attrs['layout'] == 'records'
+    y = load(path)
+    assert y == x
+    assert type(y) == list
+    assert all(type(y_i) == tuple for y_i in y)
+    assert [type(i) for i in y[0]] == [int, float, bool, complex]
+
+
+def test_load_tuple_of_records():
+    x = ((1, 2.5), (3, 4.5))
+    dump(x, path)
+    assert load(path) == x
+
+
+def test_tuples_of_mixed_types_are_not_records():
+    x = [(1, 2.5), (3, 4)]
+    dump(x, path)
+    with h5py.File(path, 'r') as f:
+        assert isinstance(f['h5it'], h5py.Group)
+    y = load(path)
+    assert y == x
+    assert type(y[1][1]) == int
+
+
+def test_load_records_too_large_to_pack():
+    x = [(2 ** 63, 1.5), (1, 2.5)]
+    dump(x, path)
+    assert load(path) == x
+
+
+def test_load_long_list_in_order():
+    x = ['a', None] * 60
+    dump(x, path)
+    assert load(path) == x
+
+
+@raises(H5itUnpicklingError)
+def test_load_list_missing_element():
+    dump(['a', None, 'c'], path)
+    with h5py.File(path, 'a') as f:
+        del f['h5it/1']
+    load(path)
+
+
+def test_load_list_saved_without_length():
+    x = ['a', None] * 6
+    dump(x, path)
+    with h5py.File(path, 'a') as f:
+        del f['h5it'].attrs['length']
+    assert load(path) == x
+
+
+def test_load_deeply_nested_list():
+    x = []
+    for _ in range(3000):
+        x = [x, None]
+    dump(x, path)
+    y = load(path)
+    depth = 0
+    while y != []:
+        y = y[0]
+        depth += 1
+    assert depth == 3000
+
+
 def test_load_empty_dict():
     x = {}
     dump(x, path)
@@ -276,6 +433,48 @@ def test_load_dict():
     assert type(y) == dict
 
 
+def test_load_dict_with_awkward_string_keys():
+    x = {'a/b': 1, '': 2, '.': 3, 'fine': 4}
+    dump(x, path)
+    y = load(path)
+    assert y == x
+    assert type(y) == dict
+
+
+def test_load_dict_with_non_ascii_keys():
+    x = {'caf\xe9': 1, '\u4e2d\u6587': None, 'plain': 'x'}
+    dump(x, path)
+    y = load(path)
+    assert y == x
+    assert all(type(k) == type('') for k in y)
+
+
+def test_string_keyed_dict_stores_values_under_keys():
+    dump({'b': 2, 'c': 'x'}, path)
+    with h5py.File(path, 'r') as f:
+        assert set(f['h5it'].keys()) == {'b', 'c'}
+
+
+def test_native_string_keyed_dict_stores_values_under_keys():
+    # byte strings on Python 2
+    x = {str('b'): 2, str('c'): 'x'}
+    dump(x, path)
+    with h5py.File(path, 'r') as f:
+        assert f['h5it'].attrs['type'] == 'unicode_dict'
+        assert set(f['h5it'].keys()) == {'b', 'c'}
+    y = load(path)
+    assert y == x
+    assert all(type(k) == str for k in y)
+
+
+def test_load_dict_with_non_ascii_byte_string_keys():
+    x = {b'caf\xc3\xa9': 1, b'a': 2}
+    dump(x, path)
+    y = load(path)
+    assert y == x
+    assert all(type(k) == bytes for k in y)
+
+
 def test_load_dict_with_non_string_keys():
     x = {1: 'a', None: True}
     dump(x, path)
@@ -403,3 +602,39 @@ else:
     @raises(H5itUnpicklingError)
     def test_load_invalid_encoding():
         load(py2_bytes_pickle, encoding='asda')
+
+
+def test_load_inline_scalars():
+    x = [1, 2.5, 1 - 2j, True, None, 2 ** 63, 'a', {'n': None, 'b': False}]
+    dump(x, path, inline=True)
+    y = load(path)
+    assert y == x
+    assert [type(i) for i in y] == [type(i) for i in x]
+    assert type(y[-1]['b']) == bool
+
+
+def test_inline_scalars_are_attributes():
+    dump({'a': 1, 'b': None, 'c': 'text'}, path, inline=True)
+    with h5py.File(path, 'r') as f:
+        assert list(f['h5it'].keys()) == ['c']
+        assert f['h5it'].attrs['inline:a'] == 1
+
+
+def test_inline_top_level_scalar_is_a_node():
+    dump(5, path, inline=True)
+    assert load(path) == 5
+
+
+def test_inline_many_scalars():
+    x = list(range(200)) + ['a']
+    dump(x, path, inline=True)
+    assert load(path) == x
+
+
+def test_inline_makes_smaller_files():
+    x = [{'a': i, 'b': float(i), 'c': None, 'd': True} for i in range(100)]
+    dump(x, path)
+    size = os.path.getsize(path)
+    dump(x, path, inline=True)
+    assert os.path.getsize(path) < size / 2
+    assert load(path) == x
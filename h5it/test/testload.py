@@ -0,0 +1,520 @@
+from __future__ import unicode_literals
+import tempfile
+from collections import OrderedDict
+
+from nose.tools import raises
+import numpy as np
+import h5py
+
+import h5it
+from h5it import (dump, load, LazyArray, Compression, Excluded,
+                  H5itUnpicklingError)
+from h5it.index import TreeIndex
+from h5it.test.testreduce import Foo
+
+
+path = tempfile.mkstemp()[1]
+
+
+def test_open_without_lazy_loads_arrays():
+    x = {'a': np.arange(10)}
+    dump(x, path)
+    with h5it.open(path) as y:
+        assert type(y['a']) == np.ndarray
+        assert np.all(y['a'] == x['a'])
+
+
+def test_open_lazy_gives_proxies():
+    x = {'a': np.random.rand(10, 4), 'b': 'text'}
+    dump(x, path)
+    with h5it.open(path, lazy=True) as y:
+        assert isinstance(y['a'], LazyArray)
+        assert y['b'] == 'text'
+
+
+def test_lazy_array_shape_and_dtype():
+    x = np.random.rand(10, 4).astype(np.float32)
+    dump(x, path)
+    with h5it.open(path, lazy=True) as y:
+        assert y.shape == (10, 4)
+        assert y.dtype == np.float32
+        assert y.ndim == 2
+        assert len(y) == 10
+
+
+def test_lazy_array_slicing():
+    x = np.random.rand(10, 4)
+    dump(x, path)
+    with h5it.open(path, lazy=True) as y:
+        assert np.all(y[2:5] == x[2:5])
+        assert np.all(y[3, 1] == x[3, 1])
+
+
+def test_lazy_array_asarray():
+    x = np.random.rand(10, 4)
+    dump(x, path)
+    with h5it.open(path, lazy=True) as y:
+        assert np.all(np.asarray(y) == x)
+
+
+def test_lazy_shared_array_is_one_proxy():
+    a = np.arange(5)
+    dump([a, a], path)
+    with h5it.open(path, lazy=True) as y:
+        assert y[0] is y[1]
+
+
+def test_open_closes_file_on_exit():
+    dump(np.arange(5), path)
+    h5it_file = h5it.open(path, lazy=True)
+    with h5it_file:
+        pass
+    assert not h5it_file.file.id.valid
+
+
+def test_mmap_uncompressed_array():
+    x = np.random.rand(100, 10)
+    dump(x, path, compression=None)
+    y = load(path, mmap=True)
+    assert isinstance(y, np.memmap)
+    assert np.all(y == x)
+
+
+def test_mmap_large_arrays_written_raw():
+    x = {'big': np.random.rand(100, 100), 'small': np.random.rand(10)}
+    dump(x, path, compression=Compression(max_size=1024))
+    y = load(path, mmap=True)
+    assert isinstance(y['big'], np.memmap)
+    assert not isinstance(y['small'], np.memmap)
+    assert np.all(y['big'] == x['big'])
+    assert np.all(y['small'] == x['small'])
+
+
+def test_mmap_falls_back_for_compressed_array():
+    x = np.random.rand(100, 10)
+    dump(x, path)
+    y = load(path, mmap=True)
+    assert type(y) == np.ndarray
+    assert np.all(y == x)
+
+
+def test_load_key_path():
+    x = {'state': {'landmarks': np.arange(6), 'name': 'face'}}
+    dump(x, path)
+    y = load(path, key='state/landmarks')
+    assert np.all(y == x['state']['landmarks'])
+
+
+def test_load_key_attribute_style():
+    x = {'state': {'landmarks': np.arange(6), 'name': 'face'}}
+    dump(x, path)
+    assert load(path, key='state.name') == 'face'
+
+
+def test_load_key_with_dots_in_name():
+    x = {'v1.2': 'dotted', 'v1': {'2': 'nested'}, 'a': {'b.c': 3}}
+    dump(x, path)
+    assert load(path, key='v1.2') == 'dotted'
+    assert load(path, key='v1/2') == 'nested'
+    assert load(path, key='a/b.c') == 3
+
+
+def test_load_key_packed_scalar():
+    x = {'nums': [1.5, 2.5, 3.5]}
+    dump(x, path)
+    y = load(path, key='nums/1')
+    assert y == 2.5
+    assert type(y) == float
+
+
+@raises(H5itUnpicklingError)
+def test_load_key_into_stacked_array():
+    dump({'arrays': landmarks()}, path)
+    load(path, key='arrays/1/0')
+
+
+@raises(H5itUnpicklingError)
+def test_load_key_into_packed_string():
+    dump({'names': ['a', 'b']}, path)
+    load(path, key='names/0/0')
+
+
+@raises(H5itUnpicklingError)
+def test_load_key_storage_of_packed_strings():
+    dump({'names': ['a', 'b']}, path)
+    load(path, key='names/data')
+
+
+def test_load_key_list_index():
+    x = {'items': ['a', None, 'c']}
+    dump(x, path)
+    assert load(path, key='items/2') == 'c'
+    assert load(path, key='items/-3') == 'a'
+
+
+def test_load_key_of_reduced_object_skips_state():
+    x = Foo()
+    dump(x, path)
+    assert load(path, key='c') == x.c
+    assert load(path, key='state/c') == x.c
+
+
+def test_load_key_in_dict_saved_as_items():
+    # 'a/b' can't be a node name, so the items are saved as (k, v) tuples
+    x = {'a/b': np.arange(3), 'c': np.arange(4)}
+    dump(x, path)
+    assert np.all(load(path, key='c') == x['c'])
+
+
+def test_load_key_string_value_in_dict_saved_as_items():
+    # each (k, v) item is two strings, so is saved packed
+    x = {'a/b': 'x', 'c': 'y'}
+    dump(x, path)
+    assert load(path, key='c') == 'y'
+
+
+def test_load_key_resolves_links_outside_subtree():
+    c = ['shared', None]
+    x = {'a': c, 'b': {'ref': c, 'ref_again': c}}
+    dump(x, path)
+    y = load(path, key='b')
+    assert y == {'ref': c, 'ref_again': c}
+    assert y['ref'] is y['ref_again']
+
+
+@raises(H5itUnpicklingError)
+def test_load_missing_key():
+    dump({'a': 1}, path)
+    load(path, key='b')
+
+
+def images():
+    return [{'name': 'img{}'.format(i), 'pixels': np.random.rand(8, 8),
+             'landmarks': np.random.rand(4, 2)} for i in range(3)]
+
+
+def test_load_exclude():
+    x = images()
+    dump(x, path)
+    y = load(path, exclude=['*/pixels'])
+    for x_i, y_i in zip(x, y):
+        assert isinstance(y_i['pixels'], Excluded)
+        assert y_i['name'] == x_i['name']
+        assert np.all(y_i['landmarks'] == x_i['landmarks'])
+
+
+def test_load_exclude_placeholder_path():
+    dump(images(), path)
+    y = load(path, exclude=['1/pixels'])
+    assert y[1]['pixels'].path == '1/pixels'
+    assert type(y[0]['pixels']) == np.ndarray
+
+
+def test_load_include():
+    x = images()
+    dump(x, path)
+    y = load(path, include=['*/landmarks'])
+    for x_i, y_i in zip(x, y):
+        assert isinstance(y_i['pixels'], Excluded)
+        assert y_i['name'] == x_i['name']
+        assert np.all(y_i['landmarks'] == x_i['landmarks'])
+
+
+def test_load_include_parent_includes_children():
+    x = {'a': {'b': np.arange(3)}, 'c': np.arange(4)}
+    dump(x, path)
+    y = load(path, include=['a'])
+    assert np.all(y['a']['b'] == x['a']['b'])
+    assert isinstance(y['c'], Excluded)
+
+
+def test_open_lazy_excluded_arrays_are_proxies():
+    x = images()
+    dump(x, path)
+    with h5it.open(path, lazy=True, exclude=['*/pixels']) as y:
+        assert isinstance(y[0]['pixels'], LazyArray)
+        assert np.all(y[0]['pixels'][:2] == x[0]['pixels'][:2])
+
+
+def test_excluded_node_referenced_elsewhere_still_loads():
+    a = np.arange(5)
+    dump({'hidden': a, 'shown': a}, path)
+    y = load(path, exclude=['hidden'])
+    assert isinstance(y['hidden'], Excluded)
+    assert np.all(y['shown'] == a)
+
+
+def test_stacked_item_loads_with_its_stack_excluded():
+    x = landmarks()
+    dump({'all': x, 'first': x[0]}, path)
+    y = load(path, exclude=['all'])
+    assert isinstance(y['all'], Excluded)
+    assert np.all(y['first'] == x[0])
+
+
+def test_stacked_item_loads_with_its_stack_not_included():
+    x = landmarks()
+    dump({'all': x, 'first': x[0]}, path)
+    y = load(path, include=['first'])
+    assert isinstance(y['all'], Excluded)
+    assert np.all(y['first'] == x[0])
+
+
+def test_indexed_dataset_reads_as_a_dataset():
+    x = np.arange(12.).reshape(3, 4)
+    dump(x, path)
+    with h5py.File(path, 'r') as f:
+        node = TreeIndex(f)['/h5it']
+        assert node.shape == (3, 4)
+        assert node.dtype == x.dtype
+        assert np.all(node[1:] == x[1:])
+        assert np.all(node[()] == x)
+
+
+def test_load_exclude_dict_values_keeps_keys():
+    x = {'d': {1: np.ones(3), 2: 'a'}}
+    dump(x, path)
+    y = load(path, exclude=['d/*'])
+    assert sorted(y['d']) == [1, 2]
+    assert all(isinstance(v, Excluded) for v in y['d'].values())
+
+
+def test_load_exclude_keeps_what_reduced_objects_are_made_from():
+    x = {'o': OrderedDict([(1, np.ones(3)), ('b', 2)])}
+    dump(x, path)
+    for exclude in (['*/1'], ['o/*']):
+        y = load(path, exclude=exclude)
+        assert type(y['o']) == OrderedDict
+        assert list(y['o']) == [1, 'b']
+        assert np.all(y['o'][1] == x['o'][1])
+
+
+def test_load_exclude_attribute_of_reduced_object():
+    x = Foo()
+    dump(x, path)
+    y = load(path, exclude=['state'])
+    assert y.c == x.c
+    y = load(path, exclude=['state/c'])
+    assert isinstance(y.c, Excluded)
+    assert y.a == x.a
+
+
+def test_index_records_children_attrs_and_links():
+    c = [1, 'a']
+    dump({'a': c, 'b': c}, path)
+    with h5py.File(path, 'r') as f:
+        index = TreeIndex(f)
+        index.add('/h5it')
+        assert sorted(index['/h5it'].keys()) == ['a', 'b']
+        assert index['/h5it'].attrs['type'] == 'unicode_dict'
+        linked = sorted(index.links.items())
+        assert len(linked) == 1
+        link, target = linked[0]
+        assert index[link] is index[target]
+        assert index[target + '/1'].value == 'a'
+
+
+def test_index_group_reports_name_found_at():
+    c = ['x', None]
+    dump({'a': c, 'b': c}, path)
+    with h5py.File(path, 'r') as f:
+        index = TreeIndex(f)
+        top = index.parent_of('/h5it')['h5it']
+        link = 'a' if top.link_target('a') is not None else 'b'
+        assert top[link].name == '/h5it/' + link
+        assert top[link].path == top.link_target(link)
+        assert top[link]['0'].name == '/h5it/{}/0'.format(link)
+
+
+def test_index_only_reads_subtree_asked_for():
+    dump({'a': [1, 2], 'b': {'c': 'd'}}, path)
+    with h5py.File(path, 'r') as f:
+        index = TreeIndex(f)
+        index.parent_of('/h5it/b')
+        assert '/h5it/b/c' in index
+        assert '/h5it/a' not in index
+
+
+def test_consolidated_metadata_round_trip():
+    c = ['shared', 2 ** 63, 1 + 2j, 1.5, True, None]
+    x = {'a': c, 'b': {'ref': c}, 'f': Foo(), 'arr': np.arange(4)}
+    dump(x, path, consolidated=True)
+    with h5py.File(path, 'r') as f:
+        assert 'h5it_metadata' in f
+    y = load(path)
+    assert y['a'] == c
+    assert y['b']['ref'] is y['a']
+    assert y['f'] == x['f']
+    assert np.all(y['arr'] == x['arr'])
+
+
+def test_consolidated_metadata_matches_walked_index():
+    dump({'a': [1, 'b', None], 'c': np.arange(3.)}, path, consolidated=True)
+    with h5py.File(path, 'r') as f:
+        walked = TreeIndex(f)
+        walked.add('/h5it')
+        read = TreeIndex(f)
+        read.loads(f['h5it_metadata'][()].tobytes())
+        assert sorted(read.nodes) == sorted(walked.nodes)
+        for p, node in walked.nodes.items():
+            assert read.nodes[p].attrs == node.attrs
+            assert (type(read.nodes[p].attrs.get('number_value')) ==
+                    type(node.attrs.get('number_value')))
+            if hasattr(node, 'children'):
+                assert read.nodes[p].children == node.children
+
+
+def test_consolidated_metadata_with_key():
+    x = {'state': {'landmarks': np.arange(6), 'name': 'face'}}
+    dump(x, path, consolidated=True)
+    assert load(path, key='state.name') == 'face'
+
+
+def test_load_key_inline_value():
+    x = {'state': {'count': 3, 'items': [None, 'a']}}
+    dump(x, path, inline=True)
+    assert load(path, key='state.count') == 3
+    assert load(path, key='state/items/0') is None
+
+
+def test_load_consolidated_inline():
+    x = [Foo(), {'a': 1, 'b': [None, 2.5]}]
+    dump(x, path, inline=True, consolidated=True)
+    assert load(path) == x
+
+
+def landmarks():
+    return [np.random.rand(68, 2) for _ in range(10)]
+
+
+def test_load_stacked_arrays():
+    x = landmarks()
+    dump(x, path)
+    with h5py.File(path, 'r') as f:
+        assert f['h5it'].shape == (10, 68, 2)
+        assert f['h5it'].attrs['layout'] == 'stacked'
+    y = load(path)
+    assert type(y) == list
+    assert all(np.all(x_i == y_i) for x_i, y_i in zip(x, y))
+    # views of one array
+    assert y[0].base is y[1].base
+
+
+def test_load_stacked_arrays_copied():
+    x = tuple(landmarks())
+    dump(x, path)
+    y = load(path, copy_views=True)
+    assert type(y) == tuple
+    assert y[0].base is None
+    assert all(np.all(x_i == y_i) for x_i, y_i in zip(x, y))
+
+
+def test_load_stacked_arrays_lazy():
+    x = landmarks()
+    dump(x, path)
+    with h5it.open(path, lazy=True) as y:
+        assert isinstance(y[3], LazyArray)
+        assert y[3].shape == (68, 2)
+        assert np.all(y[3][5] == x[3][5])
+        assert np.all(np.asarray(y[3]) == x[3])
+
+
+def test_stacked_array_found_again_keeps_identity():
+    x = landmarks()
+    dump({'all': x, 'first': x[0]}, path)
+    y = load(path)
+    assert y['first'] is y['all'][0]
+
+
+def test_shared_arrays_are_not_stacked():
+    a = np.arange(4.)
+    x = [a, a, np.arange(4.)]
+    dump(x, path)
+    y = load(path)
+    assert y[0] is y[1]
+    assert np.all(y[2] == x[2])
+
+
+def test_different_shaped_arrays_are_not_stacked():
+    x = [np.arange(4.), np.arange(5.)]
+    dump(x, path)
+    with h5py.File(path, 'r') as f:
+        assert isinstance(f['h5it'], h5py.Group)
+    y = load(path)
+    assert all(np.all(x_i == y_i) for x_i, y_i in zip(x, y))
+
+
+def test_load_key_stacked_item():
+    x = {'landmarks': landmarks()}
+    dump(x, path)
+    assert np.all(load(path, key='landmarks/-1') == x['landmarks'][-1])
+
+
+def test_include_stacked_arrays():
+    x = {'landmarks': landmarks(), 'pixels': landmarks()}
+    dump(x, path)
+    y = load(path, include=['landmarks'])
+    assert isinstance(y['pixels'], Excluded)
+    assert np.all(y['landmarks'][0] == x['landmarks'][0])
+
+
+def ragged():
+    return [np.random.rand(i % 7 + 1, 2) for i in range(20)]
+
+
+def test_load_arena_arrays():
+    x = {'shapes': ragged(), 'counts': np.arange(3, dtype=np.int32)}
+    dump(x, path, arena=True)
+    with h5py.File(path, 'r') as f:
+        assert sorted(f['h5it_arena'].keys()) == ['<f8', '<i4']
+        assert isinstance(f['h5it/shapes/00'], h5py.Group)
+    y = load(path)
+    assert all(np.all(x_i == y_i) for x_i, y_i in zip(x['shapes'], y['shapes']))
+    assert y['counts'].dtype == np.int32
+    assert np.all(y['counts'] == x['counts'])
+    # views of one array
+    assert y['shapes'][0].base is y['shapes'][1].base
+
+
+def test_arena_arrays_keep_identity():
+    a = np.arange(4.)
+    dump([a, {'again': a}], path, arena=True)
+    y = load(path)
+    assert y[0] is y[1]['again']
+
+
+def test_large_arrays_are_not_in_arena():
+    x = [np.zeros((100, 100)), np.arange(3.)]
+    dump(x, path, arena=True)
+    with h5py.File(path, 'r') as f:
+        assert isinstance(f['h5it/0'], h5py.Dataset)
+        assert f['h5it_arena/<f8'].shape == (3,)
+    y = load(path)
+    assert all(np.all(x_i == y_i) for x_i, y_i in zip(x, y))
+
+
+def test_load_arena_arrays_copied_consolidated_and_mmap():
+    x = ragged()
+    dump(x, path, arena=True, consolidated=True, compression=None)
+    y = load(path, copy_views=True)
+    assert y[0].base is None
+    assert all(np.all(x_i == y_i) for x_i, y_i in zip(x, y))
+    y = load(path, mmap=True)
+    assert all(np.all(x_i == y_i) for x_i, y_i in zip(x, y))
+
+
+def test_load_arena_arrays_lazy():
+    x = ragged()
+    dump(x, path, arena=True)
+    with h5it.open(path, lazy=True) as y:
+        assert isinstance(y[1], LazyArray)
+        assert y[1].shape == x[1].shape
+        assert np.all(y[1][0] == x[1][0])
+        assert np.all(np.asarray(y[1]) == x[1])
+
+
+def test_load_key_packed_string():
+    x = {'names': ['img{}'.format(i) for i in range(10)]}
+    dump(x, path)
+    assert load(path, key='names/3') == 'img3'
+    assert load(path, key='names/-1') == 'img9'
@@ -1,7 +1,17 @@
 from __future__ import unicode_literals
+import sys
 import tempfile
+from collections import namedtuple, OrderedDict
 
-from h5it import dump, load
+from nose.tools import raises
+from nose.plugins.skip import SkipTest
+import numpy as np
+import h5py
+
+from h5it import dump, load, register, Excluded, H5itUnpicklingError
+from h5it import stdpickle
+from h5it.stdpickle import pickle_save_global, pickle_load_global
+from h5it.base import native_base
 
 
 path = tempfile.mkstemp()[1]
@@ -28,6 +38,86 @@ class Foo(object):
                 self.g == other.g)
 
 
+Detection = namedtuple('Detection', ['frame', 'x', 'y', 'score'])
+
+
+class Link(object):
+
+    def __init__(self, value, next_link=None):
+        self.value = value
+        self.next_link = next_link
+
+
+class Point(object):
+
+    def __init__(self, i):
+        self.label = 'p{}'.format(i)
+        self.weight = i * 0.5
+        self.xy = np.array([i, -i], dtype=np.float32)
+
+
+class PointCustom(Point):
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['xy'] = state['xy'] * 2
+        return state
+
+    def __setstate__(self, state):
+        state['xy'] = state['xy'] / 2
+        self.__dict__.update(state)
+
+
+class Image(object):
+
+    def __init__(self, pixels, name):
+        self.pixels = pixels
+        self.name = name
+
+
+def save_image(image, parent, name, memo):
+    node = parent.create_dataset(name, data=image.pixels)
+    node.attrs['name'] = image.name
+
+
+def load_image(parent, name, memo, encoding):
+    node = parent[name]
+    return Image(node[()], node.attrs['name'])
+
+
+register(Image, save_image, load_image, 'test.Image')
+
+
+class Mask(Image):
+    pass
+
+
+class Items(list):
+    pass
+
+
+class Table(dict):
+    pass
+
+
+class Pair(tuple):
+    pass
+
+
+class Name(type('')):
+    pass
+
+
+class Count(int):
+    pass
+
+
+class Tagged(np.ndarray):
+
+    def __array_finalize__(self, obj):
+        self.tag = getattr(obj, 'tag', 'default')
+
+
 class FooCustom(Foo):
 
     def __getstate__(self):
@@ -73,3 +163,457 @@ def test_load_set():
     y = load(path)
     assert y == x
     assert type(y) == set
+
+
+def test_load_custom_instances_with_fresh_state():
+    # each __getstate__ makes new objects, which mustn't be mistaken for
+    # the ones made for the instances before
+    x = [FooCustom() for _ in range(50)]
+    for i, x_i in enumerate(x):
+        x_i.f = (i, i)
+    dump(x, path)
+    y = load(path)
+    assert [y_i.f for y_i in y] == [x_i.f for x_i in x]
+
+
+def test_load_deep_chain_of_instances():
+    x = None
+    for i in range(sys.getrecursionlimit() + 100):
+        x = Link(i, x)
+    dump(x, path)
+    y = load(path)
+    n = 0
+    while y is not None:
+        assert y.value == x.value
+        x, y, n = x.next_link, y.next_link, n + 1
+    assert n == sys.getrecursionlimit() + 100
+
+
+def test_load_instance_referring_to_itself():
+    x = Link(1)
+    x.next_link = x
+    dump(x, path)
+    y = load(path)
+    assert y.next_link is y
+
+
+def test_load_list_containing_itself():
+    x = [1, 'a']
+    x.append(x)
+    dump(x, path)
+    y = load(path)
+    assert y[:2] == [1, 'a']
+    assert y[2] is y
+
+
+def test_load_dict_containing_itself():
+    x = {'a': 1}
+    x['self'] = x
+    dump(x, path)
+    y = load(path)
+    assert y['self'] is y
+
+
+def test_load_tuple_containing_itself():
+    x = ([],)
+    x[0].append(x)
+    dump(x, path)
+    y = load(path)
+    assert type(y) == tuple
+    assert y[0][0] is y
+
+
+def test_load_tuples_containing_each_other():
+    inner = ([], 'a')
+    x = (inner, 1)
+    inner[0].append(x)
+    dump(x, path)
+    y = load(path)
+    assert y[0][0][0] is y
+    assert y[0][1] == 'a'
+
+
+def same_points(x, y):
+    return (type(x) == type(y) and x.label == y.label and
+            x.weight == y.weight and np.all(x.xy == y.xy))
+
+
+def test_load_columnar_instances():
+    x = [Point(i) for i in range(100)]
+    dump(x, path, columnar=True)
+    with h5py.File(path, 'r') as f:
+        assert f['h5it'].attrs['layout'] == 'columnar'
+        assert sorted(f['h5it'].keys()) == ['label', 'weight', 'xy']
+    y = load(path)
+    assert type(y) == list
+    assert all(same_points(x_i, y_i) for x_i, y_i in zip(x, y))
+
+
+def test_load_columnar_custom_state_tuple():
+    x = tuple(PointCustom(i) for i in range(10))
+    dump(x, path, columnar=True)
+    y = load(path)
+    assert type(y) == tuple
+    assert all(same_points(x_i, y_i) for x_i, y_i in zip(x, y))
+
+
+def test_columnar_instance_found_again_keeps_identity():
+    x = [Point(i) for i in range(5)]
+    dump({'all': x, 'first': x[0]}, path, columnar=True)
+    y = load(path)
+    assert y['first'] is y['all'][0]
+
+
+def test_columnar_instance_loads_with_its_list_filtered_out():
+    x = [Point(i) for i in range(5)]
+    dump({'all': x, 'first': x[0]}, path, columnar=True)
+    y = load(path, exclude=['all'])
+    assert isinstance(y['all'], Excluded)
+    assert same_points(y['first'], x[0])
+    # the list itself isn't filtered out here, so the instance is the one
+    # in it, with the columns include leaves out left out of it too
+    y = load(path, include=['first'])
+    assert y['first'] is y['all'][0]
+    assert isinstance(y['first'].xy, Excluded)
+    assert y['first'].label == x[0].label
+
+
+class Counted(object):
+    reductions = 0
+
+    def __init__(self, i):
+        self.label = 'c{}'.format(i)
+        self.extra = {'i': i}
+
+    def __getstate__(self):
+        Counted.reductions += 1
+        return self.__dict__
+
+
+def test_instances_not_saved_by_column_are_reduced_once():
+    x = [Counted(i) for i in range(3)]
+    Counted.reductions = 0
+    dump(x, path, columnar=True)
+    with h5py.File(path, 'r') as f:
+        assert 'layout' not in f['h5it'].attrs
+    assert Counted.reductions == 3
+    y = load(path)
+    assert [y_i.extra for y_i in y] == [x_i.extra for x_i in x]
+
+
+def test_instances_of_other_states_are_not_columnar():
+    x = [Foo(), Foo()]
+    dump(x, path, columnar=True)
+    with h5py.File(path, 'r') as f:
+        assert 'layout' not in f['h5it'].attrs
+    assert load(path) == x
+
+
+def test_load_key_columnar_instance():
+    x = {'points': [Point(i) for i in range(5)]}
+    dump(x, path, columnar=True)
+    assert same_points(load(path, key='points/3'), x['points'][3])
+
+
+def test_load_key_attribute_of_columnar_instance():
+    x = {'points': [Point(i) for i in range(5)]}
+    dump(x, path, columnar=True)
+    assert load(path, key='points/2/label') == x['points'][2].label
+    assert load(path, key='points.2.weight') == x['points'][2].weight
+    assert np.all(load(path, key='points/-1/xy') == x['points'][-1].xy)
+
+
+@raises(H5itUnpicklingError)
+def test_load_key_missing_attribute_of_columnar_instance():
+    dump({'points': [Point(i) for i in range(5)]}, path, columnar=True)
+    load(path, key='points/2/missing')
+
+
+@raises(H5itUnpicklingError)
+def test_load_key_into_record():
+    dump({'rec': [Detection(i, 1.5, 2.5, 0.9) for i in range(5)]}, path)
+    load(path, key='rec/0/1')
+
+
+@raises(H5itUnpicklingError)
+def test_load_key_storage_of_columnar_list():
+    dump({'points': [Point(i) for i in range(5)]}, path, columnar=True)
+    load(path, key='points/label')
+
+
+def test_load_columnar_excluding_column():
+    x = [Point(i) for i in range(5)]
+    dump(x, path, columnar=True)
+    y = load(path, exclude=['xy'])
+    assert all(isinstance(y_i.xy, Excluded) for y_i in y)
+    assert [y_i.label for y_i in y] == [x_i.label for x_i in x]
+
+
+def test_load_namedtuple_records():
+    x = [Detection(i, 0.5 * i, -0.5 * i, 0.9) for i in range(50)]
+    dump(x, path)
+    with h5py.File(path, 'r') as f:
+        assert f['h5it'].attrs['layout'] == 'records'
+        assert f['h5it'].dtype.names == Detection._fields
+    y = load(path)
+    assert y == x
+    assert all(type(y_i) == Detection for y_i in y)
+
+
+def test_load_key_namedtuple_record():
+    x = {'detections': [Detection(i, 1.5, 2.5, 0.9) for i in range(5)]}
+    dump(x, path)
+    y = load(path, key='detections/-2')
+    assert y == x['detections'][-2]
+    assert type(y) == Detection
+
+
+class CacheProbe(object):
+    # whether the class was already resolved as each instance is reduced
+    seen = []
+
+    def __reduce__(self):
+        CacheProbe.seen.append((CacheProbe,) in pickle_save_global.cache)
+        return CacheProbe, ()
+
+
+def test_instance_state_stores_values_under_names():
+    dump(Foo(), path)
+    with h5py.File(path, 'r') as f:
+        assert f['h5it/state'].attrs['type'] == 'unicode_dict'
+        assert 'a' in f['h5it/state']
+
+
+class Named(object):
+
+    def __init__(self, name):
+        self.name = name
+
+
+def test_load_key_string_valued_attribute():
+    # a native str, so on Python 2 the attribute's name and value are both
+    # byte strings
+    x = Named(str('x'))
+    dump(x, path)
+    assert load(path, key='name') == x.name
+
+
+def test_global_resolution_is_cached():
+    CacheProbe.seen = []
+    dump([CacheProbe() for _ in range(3)], path)
+    assert CacheProbe.seen == [False, True, True]
+    y = load(path)
+    assert [type(y_i) for y_i in y] == [CacheProbe] * 3
+
+
+def test_global_caches_are_cleared_after_each_call():
+    x = [Link(i) for i in range(3)]
+    dump(x, path)
+    assert len(pickle_save_global.cache) == 0
+    load(path)
+    assert len(pickle_load_global.cache) == 0
+    # a class replaced between loads (e.g. by reload) is found afresh
+    module = sys.modules[Link.__module__]
+    replacement = type(str('Link'), (Link,), {})
+    module.Link = replacement
+    try:
+        y = load(path)
+    finally:
+        module.Link = Link
+    assert [type(y_i) for y_i in y] == [replacement] * 3
+    assert [y_i.value for y_i in y] == [0, 1, 2]
+
+
+def test_global_cache_is_bounded():
+    size = stdpickle.global_cache_size
+    stdpickle.global_cache_size = 2
+    try:
+        for cls in (Foo, Link, Point, FooCustom):
+            pickle_save_global(cls)
+            assert len(pickle_save_global.cache) <= 2
+        assert pickle_save_global(Foo) == pickle_save_global(Foo)
+    finally:
+        stdpickle.global_cache_size = size
+
+
+def test_globals_are_saved_once_in_table():
+    x = [Link(i) for i in range(5)] + [Foo, len]
+    dump(x, path)
+    with h5py.File(path, 'r') as f:
+        table = f['h5it_globals'][()].tolist()
+        assert len(table) == 3
+        assert table[f['h5it/0'].attrs['cls']] == [Link.__module__, 'Link']
+        assert 'cls_module' not in f['h5it/0'].attrs
+    y = load(path)
+    assert [y_i.value for y_i in y[:5]] == list(range(5))
+    assert y[5] is Foo
+    assert y[6] is len
+
+
+def test_load_globals_saved_as_attributes():
+    # as files were saved before there was a table of globals
+    x = [Link(1), Foo]
+    dump(x, path)
+    with h5py.File(path, 'a') as f:
+        table = f['h5it_globals'][()]
+        for node, kind, old_keys in ((f['h5it/0'], 'cls',
+                                      ('cls_module', 'cls_name')),
+                                     (f['h5it/1'], 'global',
+                                      ('module', 'name'))):
+            for k, v in zip(old_keys, table[node.attrs[kind]]):
+                node.attrs[k] = v.encode('utf-8')
+            del node.attrs[kind]
+        del f['h5it_globals']
+    y = load(path)
+    assert y[0].value == 1
+    assert y[1] is Foo
+
+
+def test_load_registered_class():
+    x = [Image(np.random.rand(4, 3), 'a'), Image(np.zeros(2), 'b')]
+    dump({'images': x, 'first': x[0]}, path)
+    with h5py.File(path, 'r') as f:
+        node = f['h5it/images/0']
+        assert isinstance(node, h5py.Dataset)
+        assert node.attrs['type'] == 'test.Image'
+    y = load(path)
+    assert type(y['images'][0]) == Image
+    assert y['first'] is y['images'][0]
+    assert all(np.all(x_i.pixels == y_i.pixels) and x_i.name == y_i.name
+               for x_i, y_i in zip(x, y['images']))
+
+
+def test_load_with_dispatch_table():
+    table = {Mask: (save_image, load_image, 'test.Mask')}
+    x = Mask(np.ones(3), 'm')
+    dump(x, path, dispatch_table=table)
+    with h5py.File(path, 'r') as f:
+        assert f['h5it'].attrs['type'] == 'test.Mask'
+    y = load(path, dispatch_table=table)
+    assert np.all(y.pixels == x.pixels)
+
+
+@raises(H5itUnpicklingError)
+def test_load_without_dispatch_table_saved_with():
+    table = {Mask: (save_image, load_image, 'test.Mask')}
+    dump(Mask(np.ones(3), 'm'), path, dispatch_table=table)
+    load(path)
+
+
+def test_subclass_of_registered_class_is_reduced():
+    x = Mask(np.ones(3), 'm')
+    dump(x, path)
+    y = load(path)
+    assert type(y) == Mask
+    assert np.all(y.pixels == x.pixels)
+
+
+@raises(ValueError)
+def test_builtin_type_cannot_be_registered():
+    register(list, save_image, load_image, 'test.list')
+
+
+@raises(ValueError)
+def test_builtin_type_str_cannot_be_registered():
+    dump(Mask(np.ones(3), 'm'), path,
+         dispatch_table={Mask: (save_image, load_image, 'reduction')})
+
+
+def test_subclasses_saved_as_their_base_types():
+    x = [Items([1, 'a']), Table(a=1), Table({1: 'b'}), Pair((1, 2.5)),
+         Name('n'), Count(3)]
+    dump(x, path)
+    with h5py.File(path, 'r') as f:
+        assert f['h5it/0'].attrs['type'] == 'list'
+        assert 'subclass' in f['h5it/0'].attrs
+    y = load(path)
+    assert [type(y_i) for y_i in y] == [type(x_i) for x_i in x]
+    assert y == x
+
+
+def test_subclassed_list_containing_itself():
+    x = Items()
+    x.append(x)
+    dump(x, path)
+    y = load(path)
+    assert type(y) == Items
+    assert y[0] is y
+
+
+def test_array_subclasses_saved_as_arrays():
+    x = [np.arange(6.).view(Tagged), np.matrix([[1, 2], [3, 4]])]
+    dump(x, path)
+    with h5py.File(path, 'r') as f:
+        assert isinstance(f['h5it/0'], h5py.Dataset)
+    y = load(path)
+    assert type(y[0]) == Tagged
+    assert y[0].tag == 'default'
+    assert type(y[1]) == np.matrix
+    assert all(np.all(x_i == y_i) for x_i, y_i in zip(x, y))
+
+
+def test_memmap_saved_as_array():
+    a = np.memmap(tempfile.mkstemp()[1], dtype=np.float32, shape=(4, 3))
+    a[:] = 1.5
+    dump(a, path)
+    with h5py.File(path, 'r') as f:
+        assert isinstance(f['h5it'], h5py.Dataset)
+    y = load(path)
+    assert isinstance(y, np.memmap)
+    assert np.all(y == a)
+
+
+def test_subclass_instance_with_attributes_is_reduced():
+    x = Pair((1, 2))
+    x.extra = 'kept'
+    dump(x, path)
+    with h5py.File(path, 'r') as f:
+        assert f['h5it'].attrs['type'] == 'reduction'
+    y = load(path)
+    assert type(y) == Pair
+    assert y == x
+    assert y.extra == 'kept'
+
+
+def test_subclasses_customising_pickling_are_reduced():
+    assert native_base(Items) is list
+    assert native_base(OrderedDict) is None
+    assert native_base(np.float64) is None
+    x = OrderedDict([('b', 1), ('a', 2)])
+    dump(x, path)
+    y = load(path)
+    assert type(y) == OrderedDict
+    assert list(y.items()) == list(x.items())
+
+
+class Late(list):
+    pass
+
+
+def reduce_late(self):
+    return Late, (list(self),)
+
+
+def test_subclass_given_pickling_hook_between_dumps_is_reduced():
+    x = Late([1, 2])
+    dump(x, path)
+    with h5py.File(path, 'r') as f:
+        assert f['h5it'].attrs['type'] == 'list'
+    Late.__reduce__ = reduce_late
+    try:
+        dump(x, path)
+        with h5py.File(path, 'r') as f:
+            assert f['h5it'].attrs['type'] == 'reduction'
+        y = load(path)
+    finally:
+        del Late.__reduce__
+    assert type(y) == Late
+    assert y == x
+
+
+def test_int_enum_is_reduced():
+    try:
+        from enum import IntEnum
+    except ImportError:
+        raise SkipTest("no enum on this Python")
+    assert native_base(IntEnum) is None
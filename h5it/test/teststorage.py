@@ -0,0 +1,222 @@
+from __future__ import unicode_literals
+import struct
+import tempfile
+
+from nose.tools import raises
+from nose.plugins.skip import SkipTest
+import numpy as np
+import h5py
+
+from h5it import dump, load, Compression, Chunking
+from h5it.storage import fletcher32, read_parallel, direct_chunk_reads
+
+
+path = tempfile.mkstemp()[1]
+
+
+def dataset_info():
+    with h5py.File(path, 'r') as f:
+        ds = f['h5it']
+        return (ds.compression, ds.fletcher32, ds.shuffle,
+                ds.id.get_create_plist().get_layout())
+
+
+def test_default_compression_is_gzip_with_checksum():
+    dump(np.zeros((100, 100)), path)
+    compression, fletcher32, _, _ = dataset_info()
+    assert compression == 'gzip'
+    assert fletcher32
+
+
+def test_no_compression():
+    x = np.random.rand(100, 100)
+    dump(x, path, compression=None)
+    compression, fletcher32, _, layout = dataset_info()
+    assert compression is None
+    assert not fletcher32
+    assert layout == h5py.h5d.CONTIGUOUS
+    assert np.all(load(path) == x)
+
+
+def test_lzf_compression():
+    x = np.random.rand(100, 100)
+    dump(x, path, compression='lzf')
+    assert dataset_info()[0] == 'lzf'
+    assert np.all(load(path) == x)
+
+
+def test_gzip_with_shuffle():
+    x = np.arange(10000, dtype=np.int32)
+    dump(x, path, compression=Compression(level=9, shuffle=True))
+    compression, _, shuffle, _ = dataset_info()
+    assert compression == 'gzip'
+    assert shuffle
+    assert np.all(load(path) == x)
+
+
+def test_small_array_is_compact_and_unfiltered():
+    x = np.arange(3.)
+    dump(x, path, compression=Compression(min_size=1024))
+    compression, fletcher32, _, layout = dataset_info()
+    assert compression is None
+    assert not fletcher32
+    assert layout == h5py.h5d.COMPACT
+    assert np.all(load(path) == x)
+
+
+def test_adaptive_skips_incompressible_array():
+    x = np.random.rand(200, 200)
+    dump(x, path, compression=Compression(adaptive=True))
+    assert dataset_info()[0] is None
+    assert np.all(load(path) == x)
+
+
+def test_adaptive_compresses_compressible_array():
+    dump(np.zeros((200, 200)), path, compression=Compression(adaptive=True))
+    assert dataset_info()[0] == 'gzip'
+
+
+def test_load_scalar_ndarray():
+    x = np.array(5.5)
+    dump(x, path)
+    y = load(path)
+    assert y == x
+    assert y.shape == ()
+
+
+@raises(ValueError)
+def test_unknown_codec():
+    Compression(codec='bzip2')
+
+
+def dataset_chunks():
+    with h5py.File(path, 'r') as f:
+        return f['h5it'].chunks
+
+
+def test_leading_chunks():
+    x = np.zeros((10, 32, 32, 3))
+    dump(x, path, chunks='leading')
+    assert dataset_chunks() == (1, 32, 32, 3)
+
+
+def test_sized_chunks_group_leading_slices():
+    x = np.zeros((100, 16, 16))  # 2KB per slice
+    dump(x, path, chunks=8 * 1024)
+    assert dataset_chunks() == (4, 16, 16)
+
+
+def test_sized_chunks_split_large_slices():
+    x = np.zeros((4, 64, 64))  # 32KB per slice
+    dump(x, path, chunks=Chunking(strategy='size', target_size=8 * 1024))
+    chunks = dataset_chunks()
+    assert chunks[0] == 1
+    assert np.prod(chunks) * 8 <= 8 * 1024
+
+
+def test_chunk_override_by_path():
+    x = {'images': np.zeros((10, 8, 8)), 'other': np.zeros((10, 8, 8))}
+    dump(x, path, chunks={'images': (2, 8, 8)})
+    with h5py.File(path, 'r') as f:
+        assert f['h5it/images'].chunks == (2, 8, 8)
+        assert f['h5it/other'].chunks != (2, 8, 8)
+
+
+def test_chunk_override_forces_chunking_of_unfiltered_array():
+    dump(np.zeros((10, 8)), path, compression=None, chunks={'': (5, 8)})
+    assert dataset_chunks() == (5, 8)
+
+
+def test_unfiltered_arrays_are_not_chunked():
+    dump(np.zeros((10, 8)), path, compression=None, chunks='leading')
+    assert dataset_chunks() is None
+
+
+def test_load_with_chunk_cache_settings():
+    x = np.random.rand(10, 8)
+    dump(x, path, chunks='leading')
+    y = load(path, rdcc_nbytes=4 * 1024 * 1024, rdcc_nslots=10007)
+    assert np.all(y == x)
+
+
+@raises(ValueError)
+def test_unknown_chunk_strategy():
+    Chunking(strategy='diagonal')
+
+
+def test_fletcher32_matches_hdf5():
+    if not direct_chunk_reads:
+        raise SkipTest("can't get at raw chunks with this h5py")
+    with h5py.File(path, 'w') as f:
+        for n in (1, 7, 1000, 100001):
+            a = np.random.randint(0, 255, size=n).astype(np.uint8)
+            ds = f.create_dataset('a{}'.format(n), data=a, chunks=(n,),
+                                  fletcher32=True)
+            # one chunk, so the storage size is the chunk size
+            raw = ds.id.read_direct_chunk((0,))[1][:ds.id.get_storage_size()]
+            assert (fletcher32(raw[:-4]) ==
+                    struct.unpack('<I', raw[-4:])[0])
+
+
+def test_fletcher32_of_zeros_and_ones():
+    assert fletcher32(b'\0' * 10) == 0
+    assert fletcher32(b'\xff' * 10) == 0xffffffff
+
+
+def test_load_with_threads():
+    x = np.random.rand(401, 403)
+    dump(x, path, compression=Compression(shuffle=True), chunks=64 * 1024)
+    y = load(path, threads=4)
+    assert np.all(y == x)
+
+
+def test_load_with_threads_unallocated_chunks():
+    with h5py.File(path, 'w') as f:
+        ds = f.create_dataset('h5it', shape=(400, 400), chunks=(100, 100),
+                              compression='gzip', fillvalue=-1.)
+        ds[:150, :150] = 2.
+        ds.attrs['type'] = 'ndarray'
+    y = load(path, threads=4)
+    assert np.all(y[:150, :150] == 2.)
+    assert np.all(y[150:] == -1.)
+
+
+def test_read_parallel_skips_unsupported_filters():
+    x = np.random.rand(400, 400)
+    dump(x, path, compression='lzf')
+    with h5py.File(path, 'r') as f:
+        assert read_parallel(f['h5it'], 4) is None
+    assert np.all(load(path, threads=4) == x)
+
+
+def test_dump_with_threads():
+    x = np.random.rand(401, 403)
+    dump(x, path, compression=Compression(shuffle=True), chunks=64 * 1024,
+         threads=4)
+    compression, fletcher32, shuffle, _ = dataset_info()
+    assert compression == 'gzip'
+    assert fletcher32
+    assert shuffle
+    # read back by HDF5 itself, not our own chunk decoding
+    assert np.all(load(path) == x)
+
+
+def test_dump_with_threads_matches_single_threaded_chunks():
+    if not direct_chunk_reads:
+        raise SkipTest("can't get at raw chunks with this h5py")
+    x = np.arange(400 * 400, dtype=np.float64).reshape(400, 400)
+    compression = Compression(level=6, shuffle=True)
+    chunks = {}
+    for threads in (1, 4):
+        dump(x, path, compression=compression, chunks=64 * 1024,
+             threads=threads)
+        with h5py.File(path, 'r') as f:
+            chunks[threads] = f['h5it'].id.read_direct_chunk((0, 0))
+    assert chunks[1] == chunks[4]
+
+
+def test_dump_with_threads_unsupported_filter():
+    x = np.random.rand(400, 400)
+    dump(x, path, compression='lzf', threads=4)
+    assert dataset_info()[0] == 'lzf'
+    assert np.all(load(path) == x)